@@ -0,0 +1,76 @@
+"""Compare two benchmark result files.
+
+Prints the relative change of every measurement that is present in both
+files and exits with status 1 if a measurement became worse by more than
+the threshold.
+
+usage: python benchmarks/compare.py [-t PERCENT] OLD NEW
+"""
+
+import argparse
+import json
+import sys
+
+# measurement -> True if higher is better
+_MEASURES = {
+    'median_us': False,
+    'wall_s': False,
+    'files_per_s': True,
+    'bytes_per_s': True,
+    'list_s': False,
+    'mean_done_s': False,
+    'peak_rss_kib': False,
+}
+
+
+def compare(old, new, threshold):
+    """Compare results.
+
+    :param dict old: old results
+    :param dict new: new results
+    :param float threshold: threshold for regressions in percent
+    :return: list of tuples (benchmark, case, measure, old, new,
+             change in percent, regression)
+    :rtype: list
+    """
+    rows = []
+    for bench in sorted(old.keys() & new.keys() - {'meta'}):
+        for case in sorted(old[bench].keys() & new[bench].keys()):
+            for measure, higher_better in _MEASURES.items():
+                a = old[bench][case].get(measure)
+                b = new[bench][case].get(measure)
+                if not a or b is None:
+                    continue
+                change = (b - a) / a * 100
+                worse = -change if higher_better else change
+                rows.append((bench, case, measure, a, b, change,
+                             worse > threshold))
+    return rows
+
+
+def main():
+    """Compare two result files."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-t', '--threshold', type=float, default=10.0,
+                        help='regression threshold in percent'
+                             ' [default: 10]')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    args = parser.parse_args()
+    with open(args.old) as fh:
+        old = json.load(fh)
+    with open(args.new) as fh:
+        new = json.load(fh)
+    print(f'old: {old.get("meta", {}).get("commit")}')
+    print(f'new: {new.get("meta", {}).get("commit")}')
+    regressions = 0
+    for bench, case, measure, a, b, change, regression in compare(
+            old, new, args.threshold):
+        regressions += regression
+        print(f'{bench:10} {case:24} {measure:13} {a:>14} {b:>14}'
+              f' {change:+7.1f}%{"  REGRESSION" if regression else ""}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Import time benchmark.
+
+Runs ``python -X importtime`` in a fresh interpreter for the modules
+used by the ``filetransfer`` script and reports the cumulative import
+time of every module and whether the protocol libraries were imported.
+
+usage: python benchmarks/importtime.py [-n RUNS] [-o FILE] [MODULE ...]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+_DEFAULT_MODULES = ['filetransfer', 'filetransfer.__main__']
+_HEAVY = ['paramiko', 'ftputil', 'cryptography']
+_LINE_RE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure(module):
+    """Import ``module`` in a new interpreter.
+
+    :param str module: module name
+    :return: cumulative import time in microseconds per imported module
+    :rtype: dict
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                           f'import {module}'],
+                          stderr=subprocess.PIPE, universal_newlines=True,
+                          env=_env(), check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        mo = _LINE_RE.match(line)
+        if mo:
+            times[mo.group(4)] = int(mo.group(2))
+    return times
+
+
+def _env():
+    env = dict(os.environ)
+    src = os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), 'src')
+    env['PYTHONPATH'] = os.pathsep.join(
+        p for p in (src, env.get('PYTHONPATH')) if p)
+    return env
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--runs', type=int, default=5)
+    parser.add_argument('-o', '--output', help='write results as JSON')
+    parser.add_argument('modules', nargs='*', default=_DEFAULT_MODULES)
+    args = parser.parse_args()
+    results = {}
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.runs)]
+        total = statistics.median(r.get(module, 0) for r in runs)
+        results[module] = {
+            'median_us': total,
+            'heavy_imports': sorted(h for h in _HEAVY if h in runs[0]),
+        }
+        heavy = ', '.join(results[module]['heavy_imports']) or '-'
+        print(f'{module}: {total / 1000:.1f} ms (heavy: {heavy})')
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump({'importtime': results}, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Local FTP, FTPS and SFTP servers for the benchmarks.
+
+The servers run in threads of the benchmark process and serve a local
+directory. FTP and FTPS use pyftpdlib, SFTP uses paramiko. The servers
+are not meant to be fast; they are stand-ins so that the protocol code
+of filetransfer can be measured without real servers.
+"""
+
+import datetime
+import os
+import socket
+import tempfile
+import threading
+
+USER = 'bench'
+PASSWORD = 'bench'
+
+
+class FTPServer:
+    """FTP or FTPS server (requires pyftpdlib).
+
+    :param str root: the directory to serve
+    :param bool tls: if ``True`` an FTPS server will be started
+    """
+
+    def __init__(self, root, tls=False):
+        from pyftpdlib.authorizers import DummyAuthorizer
+        from pyftpdlib.servers import FTPServer as _FTPServer
+        if tls:
+            from pyftpdlib.handlers import TLS_FTPHandler as handler_cls
+        else:
+            from pyftpdlib.handlers import FTPHandler as handler_cls
+        authorizer = DummyAuthorizer()
+        authorizer.add_user(USER, PASSWORD, root, perm='elradfmwMT')
+
+        class Handler(handler_cls):
+            pass
+
+        Handler.authorizer = authorizer
+        Handler.banner = 'benchmark server'
+        if tls:
+            Handler.certfile = _certfile()
+        self._server = _FTPServer(('127.0.0.1', 0), Handler)
+        self.port = self._server.socket.getsockname()[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={'timeout': 0.1, 'handle_exit': False}, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.close_all()
+        self._thread.join()
+
+
+class SFTPServer:
+    """SFTP server (requires paramiko).
+
+    :param str root: the directory to serve
+    """
+
+    def __init__(self, root):
+        import paramiko
+        self._root = root
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self._sock = socket.socket()
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(16)
+        self._sock.settimeout(0.1)
+        self.port = self._sock.getsockname()[1]
+        self._transports = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+
+    def write_known_hosts(self, path):
+        """Write a ``known_hosts`` file with the key of the server."""
+        with open(path, 'w') as fh:
+            fh.write(f'[127.0.0.1]:{self.port} {self.host_key.get_name()}'
+                     f' {self.host_key.get_base64()}\n')
+
+    def _accept(self):
+        import paramiko
+        server_cls, handler_cls = _sftp_classes(self._root)
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            conn.settimeout(None)
+            transport = paramiko.Transport(conn)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler('sftp', paramiko.SFTPServer,
+                                            handler_cls)
+            transport.start_server(server=server_cls())
+            self._transports.append(transport)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+        self._sock.close()
+        for transport in self._transports:
+            transport.close()
+
+
+def _sftp_classes(root):
+    import paramiko
+    from paramiko.sftp import SFTP_OK
+
+    class Server(paramiko.ServerInterface):
+        def check_auth_password(self, username, password):
+            if (username, password) == (USER, PASSWORD):
+                return paramiko.AUTH_SUCCESSFUL
+            return paramiko.AUTH_FAILED
+
+        def get_allowed_auths(self, username):
+            return 'password'
+
+        def check_channel_request(self, kind, chanid):
+            if kind == 'session':
+                return paramiko.OPEN_SUCCEEDED
+            return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def local(path):
+        return os.path.join(root, os.path.normpath('/' + path).lstrip('/'))
+
+    def error(ex):
+        return paramiko.SFTPServer.convert_errno(ex.errno)
+
+    class Handler(paramiko.SFTPServerInterface):
+        def list_folder(self, path):
+            path = local(path)
+            try:
+                lst = []
+                for name in os.listdir(path):
+                    attr = paramiko.SFTPAttributes.from_stat(
+                        os.stat(os.path.join(path, name)))
+                    attr.filename = name
+                    lst.append(attr)
+                return lst
+            except OSError as ex:
+                return error(ex)
+
+        def stat(self, path):
+            try:
+                return paramiko.SFTPAttributes.from_stat(os.stat(local(path)))
+            except OSError as ex:
+                return error(ex)
+
+        lstat = stat
+
+        def open(self, path, flags, attr):
+            path = local(path)
+            try:
+                fd = os.open(path, flags | getattr(os, 'O_BINARY', 0), 0o644)
+                if flags & os.O_WRONLY:
+                    mode = 'ab' if flags & os.O_APPEND else 'wb'
+                elif flags & os.O_RDWR:
+                    mode = 'a+b' if flags & os.O_APPEND else 'r+b'
+                else:
+                    mode = 'rb'
+                fobj = os.fdopen(fd, mode)
+            except OSError as ex:
+                return error(ex)
+            handle = paramiko.SFTPHandle(flags)
+            handle.filename = path
+            handle.readfile = handle.writefile = fobj
+            return handle
+
+        def remove(self, path):
+            try:
+                os.remove(local(path))
+            except OSError as ex:
+                return error(ex)
+            return SFTP_OK
+
+        def rename(self, oldpath, newpath):
+            try:
+                os.rename(local(oldpath), local(newpath))
+            except OSError as ex:
+                return error(ex)
+            return SFTP_OK
+
+        posix_rename = rename
+
+        def mkdir(self, path, attr):
+            try:
+                os.mkdir(local(path))
+            except OSError as ex:
+                return error(ex)
+            return SFTP_OK
+
+        def rmdir(self, path):
+            try:
+                os.rmdir(local(path))
+            except OSError as ex:
+                return error(ex)
+            return SFTP_OK
+
+        def chattr(self, path, attr):
+            return SFTP_OK
+
+    return Server, Handler
+
+
+def _certfile():
+    """Create a self-signed certificate for the FTPS server."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, '127.0.0.1')])
+    now = datetime.datetime.utcnow()
+    cert = (x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now)
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+    fd, path = tempfile.mkstemp(prefix='filetransfer-bench-', suffix='.pem')
+    with os.fdopen(fd, 'wb') as fh:
+        fh.write(key.private_bytes(serialization.Encoding.PEM,
+                                   serialization.PrivateFormat.PKCS8,
+                                   serialization.NoEncryption()))
+        fh.write(cert.public_bytes(serialization.Encoding.PEM))
+    return path
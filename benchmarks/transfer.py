@@ -0,0 +1,247 @@
+"""Transfer benchmark.
+
+Transfers synthetic trees (see :mod:`trees`) between every combination
+of local directories and local FTP, FTPS and SFTP servers (see
+:mod:`servers`) with :func:`filetransfer.transfer` and reports the
+throughput, files per second, listing time, mean completion time of the
+files (time from the start of the transfer until a file is done; it
+depends on the option ``order`` of the source) and peak RSS.
+
+Every run is executed in a new interpreter, so that the peak RSS of
+one run does not influence the next one. The servers run in the same
+process as the transfer, so the RSS includes them (the RSS measured
+before the transfer is reported as ``rss_start_kib``).
+
+usage: python benchmarks/transfer.py [-n RUNS] [-s SCENARIO ...]
+           [-e ENDPOINT ...] [--scale SCALE] [--list-workers N]
+           [--order ORDER] [-d DIR] [-o FILE]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import trees  # noqa: E402
+
+_ENDPOINTS = ['local', 'ftp', 'ftps', 'sftp']
+_SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src')
+
+
+def _peak_rss_kib():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def _endpoint_cfg(endpoint, base, path, servers):
+    if endpoint == 'local':
+        return {'path': os.path.join(base, path)}
+    cfg = {
+        'type': endpoint.upper(),
+        'user': 'bench',
+        'password': 'bench',
+        'path': '/' + path,
+    }
+    server = servers[endpoint]
+    cfg['host'] = f'127.0.0.1:{server.port}'
+    if endpoint == 'sftp':
+        known_hosts = os.path.join(base, f'known_hosts-{os.getpid()}')
+        server.write_known_hosts(known_hosts)
+        cfg['known_hosts'] = known_hosts
+    else:
+        cfg['keep_alive'] = '0'
+    return cfg
+
+
+def run_case(base, tree, src, tgt, list_workers='1', order='name'):
+    """Run one transfer and return the measurements.
+
+    Must be called in a new interpreter (see: :func:`main`).
+    """
+    import contextlib
+    import filetransfer
+    import servers
+
+    class Hooks(filetransfer.TransferHooks):
+        def __init__(self):
+            self.done = []
+
+        def file_done(self, path, stats):
+            self.done.append(time.perf_counter())
+
+    out = os.path.join('out', f'{os.getpid()}')
+    os.makedirs(os.path.join(base, out))
+    with contextlib.ExitStack() as stack:
+        running = {}
+        for endpoint in {src, tgt} - {'local'}:
+            if endpoint == 'sftp':
+                server = servers.SFTPServer(base)
+            else:
+                server = servers.FTPServer(base, endpoint == 'ftps')
+            running[endpoint] = stack.enter_context(server)
+        src_cfg = _endpoint_cfg(src, base, os.path.relpath(tree, base),
+                                running)
+        src_cfg.update(files='*', recursive='yes', list_workers=list_workers,
+                       order=order)
+        tgt_cfg = _endpoint_cfg(tgt, base, out, running)
+        hooks = Hooks()
+        rss_start = _peak_rss_kib()
+        t = time.perf_counter()
+        result = filetransfer.transfer(src_cfg, tgt_cfg, hooks=hooks)
+        wall = time.perf_counter() - t
+    shutil.rmtree(os.path.join(base, out), ignore_errors=True)
+    if result.src_error_cnt or result.tgt_error_cnt:
+        raise RuntimeError(f'transfer with errors: {result}')
+    return {
+        'wall_s': wall,
+        'files': result.files_cnt,
+        'bytes': result.bytes_cnt,
+        'list_s': result.list_time,
+        'mean_done_s': (statistics.mean(d - t for d in hooks.done)
+                        if hooks.done else None),
+        'rss_start_kib': rss_start,
+        'peak_rss_kib': _peak_rss_kib(),
+    }
+
+
+def _run_subprocess(base, tree, src, tgt, list_workers, order):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        p for p in (_SRC_DIR, env.get('PYTHONPATH')) if p)
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__),
+                           '--run-case', base, tree, src, tgt,
+                           str(list_workers), order],
+                          stdout=subprocess.PIPE, universal_newlines=True,
+                          env=env)
+    if proc.returncode:
+        return None
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def _summarize(runs):
+    wall = statistics.median(r['wall_s'] for r in runs)
+    first = runs[0]
+    return {
+        'runs': len(runs),
+        'wall_s': round(wall, 4),
+        'files': first['files'],
+        'bytes': first['bytes'],
+        'files_per_s': round(first['files'] / wall, 1) if wall else None,
+        'bytes_per_s': round(first['bytes'] / wall) if wall else None,
+        'list_s': round(statistics.median(r['list_s'] for r in runs), 4),
+        'mean_done_s': (round(statistics.median(r['mean_done_s']
+                                                for r in runs), 4)
+                        if first['mean_done_s'] is not None else None),
+        'rss_start_kib': max((r['rss_start_kib'] or 0) for r in runs),
+        'peak_rss_kib': max((r['peak_rss_kib'] or 0) for r in runs),
+    }
+
+
+def _available(endpoint):
+    module = {'ftp': 'pyftpdlib', 'ftps': 'pyftpdlib',
+              'sftp': 'paramiko'}.get(endpoint)
+    if module is None:
+        return True
+    try:
+        __import__(module)
+    except ImportError:
+        print(f'{endpoint}: {module} not installed; skipped', file=sys.stderr)
+        return False
+    return True
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'],
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL,
+                              universal_newlines=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    """Run the benchmark."""
+    if len(sys.argv) == 8 and sys.argv[1] == '--run-case':
+        print(json.dumps(run_case(*sys.argv[2:])))
+        return
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--runs', type=int, default=3)
+    parser.add_argument('-s', '--scenario', nargs='+',
+                        choices=sorted(trees.SCENARIOS),
+                        default=sorted(trees.SCENARIOS))
+    parser.add_argument('-e', '--endpoint', nargs='+', choices=_ENDPOINTS,
+                        default=_ENDPOINTS,
+                        help='source and target types to combine')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='factor for the size of the trees')
+    parser.add_argument('--list-workers', type=int, default=1,
+                        help='option list_workers of the source')
+    parser.add_argument('--order', default='name',
+                        choices=['name', 'largest', 'smallest'],
+                        help='option order of the source')
+    parser.add_argument('-d', '--data-dir',
+                        help='directory for the trees (kept between runs)')
+    parser.add_argument('-o', '--output', help='write results as JSON')
+    args = parser.parse_args()
+    endpoints = [e for e in args.endpoint if _available(e)]
+    base = os.path.abspath(args.data_dir or tempfile.mkdtemp(
+        prefix='filetransfer-bench-'))
+    results = {}
+    try:
+        for scenario in args.scenario:
+            tree = trees.create(base, scenario, args.scale)
+            for src in endpoints:
+                for tgt in endpoints:
+                    case = f'{scenario}/{src}->{tgt}'
+                    runs = [_run_subprocess(base, tree, src, tgt,
+                                            args.list_workers, args.order)
+                            for _ in range(args.runs)]
+                    if None in runs:
+                        print(f'{case}: failed', file=sys.stderr)
+                        continue
+                    res = results[case] = _summarize(runs)
+                    print(f'{case:24} {res["wall_s"]:8.3f}s'
+                          f' {res["files_per_s"]:10.1f} files/s'
+                          f' {res["bytes_per_s"] / 1048576:9.2f} MiB/s'
+                          f'  list {res["list_s"]:.3f}s'
+                          f'  done {res["mean_done_s"] or 0:.3f}s'
+                          f'  rss {res["peak_rss_kib"] / 1024:.0f} MiB')
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(base, ignore_errors=True)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump({
+                'meta': {
+                    'commit': _commit(),
+                    'date': datetime.datetime.now().isoformat(
+                        timespec='seconds'),
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'scale': args.scale,
+                    'list_workers': args.list_workers,
+                    'order': args.order,
+                },
+                'transfer': results,
+            }, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
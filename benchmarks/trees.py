@@ -0,0 +1,80 @@
+"""Synthetic directory trees for the benchmarks.
+
+Every scenario is a function that creates a tree in a directory. The
+``scale`` factor multiplies the number of files (``tiny``, ``deep``)
+or their size (``huge``, ``mixed``).
+"""
+
+import os
+
+_CHUNK = 1 << 20
+
+
+def _write(path, size):
+    with open(path, 'wb') as fh:
+        while size > 0:
+            n = min(size, _CHUNK)
+            fh.write(os.urandom(n))
+            size -= n
+
+
+def tiny(root, scale=1.0):
+    """Many tiny files (1 KiB) in 20 directories."""
+    count = max(1, int(2000 * scale))
+    for i in range(count):
+        d = os.path.join(root, f'd{i % 20:02d}')
+        os.makedirs(d, exist_ok=True)
+        _write(os.path.join(d, f'f{i:06d}.dat'), 1024)
+
+
+def huge(root, scale=1.0):
+    """A few huge files (4 x 64 MiB)."""
+    os.makedirs(root, exist_ok=True)
+    for i in range(4):
+        _write(os.path.join(root, f'f{i}.dat'), int(64 * _CHUNK * scale))
+
+
+def deep(root, scale=1.0):
+    """Deep nesting: a binary tree of directories with 8 levels."""
+    files = max(1, int(2 * scale))
+
+    def mk(path, level):
+        os.makedirs(path, exist_ok=True)
+        for i in range(files):
+            _write(os.path.join(path, f'f{i}.dat'), 4096)
+        if level < 8:
+            mk(os.path.join(path, 'a'), level + 1)
+            mk(os.path.join(path, 'b'), level + 1)
+
+    mk(root, 1)
+
+
+def mixed(root, scale=1.0):
+    """Mixed sizes: 200 small files (4 KiB) and 4 big files (16 MiB)
+    between them in name order (for option ``order``)."""
+    os.makedirs(root, exist_ok=True)
+    for i in range(200):
+        size = 16 * _CHUNK if i % 50 == 25 else 4096
+        _write(os.path.join(root, f'f{i:03d}.dat'), int(size * scale))
+
+
+SCENARIOS = {
+    'tiny': tiny,
+    'huge': huge,
+    'deep': deep,
+    'mixed': mixed,
+}
+
+
+def create(base, name, scale=1.0):
+    """Create the tree for scenario ``name`` unless it exists.
+
+    :return: path of the tree
+    :rtype: str
+    """
+    root = os.path.join(base, f'{name}-{scale:g}')
+    marker = os.path.join(root, '.complete')
+    if not os.path.exists(marker):
+        SCENARIOS[name](root, scale)
+        open(marker, 'w').close()
+    return root
@@ -9,18 +9,24 @@ This module uses a :mod:`logger <logging>` with the name ``'filetransfer'``.
 
 import configparser
 import signal
+from contextlib import closing
 
 from . import config, job
 from .const import FileTags
 from .exceptions import (Error, ConfigError, ConnectError, NotReadyError,
                          SingleInstanceError, TransferError, Terminated)
+from .hooks import TransferHooks
 from .job import JobResult
+from .records import FileRecords
+from .stats import ConnectStats, FileStats, TransferStats
 
 __version__ = '0.11.0'
 
 __all__ = ['Error', 'ConfigError', 'ConnectError', 'TransferError',
            'SingleInstanceError', 'Terminated', 'NotReadyError', 'JobResult',
-           'FileTags', 'set_sigterm_handler', 'configure', 'transfer']
+           'FileStats', 'ConnectStats', 'FileTags', 'TransferHooks',
+           'set_sigterm_handler', 'configure', 'transfer', 'iter_transfer',
+           'atransfer', 'aiter_transfer']
 
 
 def configure(cfg_file, job_id, **kwargs):
@@ -38,10 +44,11 @@ def configure(cfg_file, job_id, **kwargs):
        transfer itself will not be run.
        See :ref:`example <ref-configure-and-run>`.
 
-       .. function:: filetransfer.run(exc=None)
+       .. function:: filetransfer.run(exc=None, *, hooks=None)
 
           :param BaseException exc: exception to be reraised
                                     within this function
+          :param TransferHooks hooks: event hooks
           :returns: result and exit code (0: success, 1: with errors)
           :rtype: JobResult, int
           :raises ConnectError: see above
@@ -53,6 +60,7 @@ def configure(cfg_file, job_id, **kwargs):
        .. versionchanged:: 0.7.3 Add exception parameter to ``run()``
        .. versionchanged:: 0.10.0
           Return :class:`JobResult` and exit code
+       .. versionchanged:: 0.12.0 Add parameter ``hooks``
 
     You can put your own configuration sections in the application
     and job configuration files. The names of theses sections must
@@ -95,13 +103,13 @@ def configure(cfg_file, job_id, **kwargs):
     except Exception as ex:
         raise ConfigError(ex)
 
-    def run(exc=None):
-        return job.run(app_cfg, job_cfg, exc)
+    def run(exc=None, *, hooks=None):
+        return job.run(app_cfg, job_cfg, exc, hooks)
 
     return run, cp
 
 
-def transfer(src_cfg, tgt_cfg=None, *, collect_data=False):
+def transfer(src_cfg, tgt_cfg=None, *, collect_data=False, hooks=None):
     """Transfer files.
 
     The first parameter (``src_cfg``) may be a :class:`dict` or a
@@ -126,7 +134,11 @@ def transfer(src_cfg, tgt_cfg=None, *, collect_data=False):
     :param tgt_cfg: the target configuration
     :type tgt_cfg: dict or None
     :param bool collect_data: if ``True`` the file list for the
-                              :class:`JobResult` will be created
+                              :class:`JobResult` will be created;
+                              it is a lazy, sorted iterable
+                              (records are spilled to a temporary
+                              file for large jobs)
+    :param TransferHooks hooks: event hooks
     :return: job result
     :rtype: filetransfer.JobResult
     :raises filetransfer.ConfigError: if there is a problem with
@@ -134,12 +146,99 @@ def transfer(src_cfg, tgt_cfg=None, *, collect_data=False):
     :raises filetransfer.ConnectError: if there is a connection problem
     :raises filetransfer.TransferError: if there is a fatal problem
                                         during transfer
+    :raises filetransfer.Terminated: if the transfer was cancelled
+                                     (see: :meth:`TransferHooks.cancel`)
 
     .. versionchanged:: 0.7.0
        This function now returns a :class:`JobResult` object
     .. versionchanged:: 0.10.0
        Add parameter ``collect_data``
+    .. versionchanged:: 0.12.0
+       Add parameter ``hooks``; ``file_list`` is no longer a :class:`list`
     """
+    job_cfg = _get_job_cfg(src_cfg, tgt_cfg)
+    files = FileRecords(collect_data)
+    tstats = TransferStats()
+    job.transfer(job_cfg, files, tstats, hooks)
+    return job.create_result(files, tstats)
+
+
+def iter_transfer(src_cfg, tgt_cfg=None, *, hooks=None):
+    """Transfer files and yield a tuple for each file when it is done.
+
+    The tuples have the same form as the entries of
+    :attr:`JobResult.file_list`: (path, info, tag). Nothing is
+    collected, so the memory usage does not grow with the number of files.
+    The connections are closed when the iterator is exhausted
+    or closed.
+
+    The configuration is checked when this function is called; the
+    other errors are raised by the iterator.
+    See :func:`transfer` for the parameters and exceptions.
+
+    :return: iterator
+
+    .. versionadded:: 0.12.0
+    """
+    job_cfg = _get_job_cfg(src_cfg, tgt_cfg)
+
+    def entries():
+        with closing(job.iter_transfer(job_cfg, hooks=hooks)) as it:
+            for path, value in it:
+                yield job.file_entry(path, value)
+
+    return entries()
+
+
+async def atransfer(src_cfg, tgt_cfg=None, *, collect_data=False,
+                    hooks=None, executor=None):
+    """Transfer files (asyncio version of :func:`transfer`).
+
+    The blocking steps of the transfer (connecting, transferring a file,
+    closing the connections) run in a thread pool. A job only occupies
+    a thread while one of its steps is running. If the task is cancelled,
+    the transfer stops after the current chunk (see:
+    :meth:`TransferHooks.cancel`).
+
+    See :func:`transfer` for the other parameters and the exceptions.
+
+    :param executor: executor for the blocking steps; if ``None``
+                     a shared thread pool will be used
+    :type executor: concurrent.futures.Executor
+    :return: job result
+    :rtype: filetransfer.JobResult
+
+    .. versionadded:: 0.12.0
+    """
+    from . import aio
+    job_cfg = _get_job_cfg(src_cfg, tgt_cfg)
+    return await aio.transfer(job_cfg, collect_data, hooks, executor)
+
+
+def aiter_transfer(src_cfg, tgt_cfg=None, *, hooks=None, executor=None):
+    """Asyncio version of :func:`iter_transfer`.
+
+    See :func:`atransfer` for the parameters.
+
+    :return: asynchronous iterator
+
+    .. versionadded:: 0.12.0
+    """
+    from . import aio
+    job_cfg = _get_job_cfg(src_cfg, tgt_cfg)
+
+    async def entries():
+        agen = aio.iter_transfer(job_cfg, hooks=hooks, executor=executor)
+        try:
+            async for path, value in agen:
+                yield job.file_entry(path, value)
+        finally:
+            await agen.aclose()
+
+    return entries()
+
+
+def _get_job_cfg(src_cfg, tgt_cfg):
     import logging
     logging.getLogger(__name__).addHandler(logging.NullHandler())
     try:
@@ -149,6 +248,9 @@ def transfer(src_cfg, tgt_cfg=None, *, collect_data=False):
         else:
             cp = src_cfg
         job_cfg = config.get_job_cfg(cp)
+        job_cfg.add('source_paths', None)
+        job_cfg.add('snapshot_file', None)
+        job_cfg.add('watermark_file', None)
         if 'type' in cp['source']:
             host_cfg = config.get_host_cfg(cp, 'source')
             job_cfg.add('source_host_cfg', host_cfg)
@@ -158,9 +260,7 @@ def transfer(src_cfg, tgt_cfg=None, *, collect_data=False):
         config.set_urls(job_cfg)
     except Exception as ex:
         raise ConfigError(ex)
-    files = {}
-    job.transfer(job_cfg, files)
-    return job.create_result(files, collect_data)
+    return job_cfg
 
 
 def set_sigterm_handler():
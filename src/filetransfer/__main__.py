@@ -1,12 +1,14 @@
 """Main module.
 
 usage:
- $name [-v | -vv] [-c CONFIG] JOBID
+ $name [-v | -vv] [-c CONFIG] [-w WORKERS] [-P [-o FILE]] JOBID...
+ $name -D [-c CONFIG]
+ $name -m [-c CONFIG]
  $name -k [-H] [-p PORT] HOST FILE
  $name -d [-p PORT] HOST FILE
  $name -h | -V
 
- JOBID   the job id
+ JOBID   the job id or a glob-style pattern matching job ids
  HOST    server name or IP
  FILE    known-hosts file
 
@@ -14,11 +16,22 @@ usage:
                       If not given the value of the environment
                       variable $envvar will be used.
  -d, --delete         delete server hostkey from known-hosts file
+ -D, --daemon         run the jobs with a schedule in their
+                      configuration until terminated
  -H, --hash           hash hostnames
  -k, --hostkey        get hostkey from SFTP server
+ -m, --send-mail      send the spooled notification emails
+ -o, --profile-file FILE
+                      file for the profile data (only with one job;
+                      default: next to the log file)
  -p, --port PORT      SFTP server port [default: $sshport]
+ -P, --profile        run the jobs with the profiler
+                      (see section [profile] in the configuration)
  -v, --verbose        once: print message
                       twice: print stack trace
+ -w, --workers WORKERS
+                      max. number of jobs running concurrently
+                      if more than one job is given [default: 4]
 
  -h, --help           show this help
  -V, --version        show the version
@@ -27,14 +40,12 @@ usage:
   $exit_codes
 """
 
-import base64
-import hashlib
 import logging
 import os
 import sys
 from contextlib import suppress
+from pathlib import Path
 
-from paramiko import HostKeys, Transport, SSHException
 from salmagundi import strings
 from salmagundi.utils import docopt_helper
 
@@ -60,18 +71,32 @@ def main():
         return _get_hostkey(args)
     if args['--delete']:
         return _del_hostkey(args)
+    if args['--daemon']:
+        return _run_daemon(args)
+    if args['--send-mail']:
+        return _send_mail(args)
+    job_ids = args['JOBID']
+    if len(job_ids) > 1 or any(c in job_ids[0] for c in '*?['):
+        return _run_filetransfers(args)
     return _run_filetransfer(args)
 
 
+def _get_cfg_file(args):
+    if args['--config']:
+        return args['--config']
+    return os.getenv(_ENV_VAR_NAME)
+
+
 def _run_filetransfer(args):
     set_sigterm_handler()
     verbose = args['--verbose']
     try:
-        if args['--config']:
-            cfg_file = args['--config']
-        else:
-            cfg_file = os.getenv(_ENV_VAR_NAME)
-        app_cfg, job_cfg = config.configure(cfg_file, args['JOBID'])
+        app_cfg, job_cfg = config.configure(_get_cfg_file(args),
+                                            args['JOBID'][0])
+        if args['--profile']:
+            app_cfg['profile', 'enabled'] = True
+            if args['--profile-file']:
+                app_cfg['profile', 'file'] = Path(args['--profile-file'])
         result, status = job.run(app_cfg, job_cfg)
         if verbose:
             print(f'Job finished: {result}')
@@ -89,6 +114,89 @@ def _run_filetransfer(args):
     return status
 
 
+def _run_filetransfers(args):
+    from . import runner
+    set_sigterm_handler()
+    verbose = args['--verbose']
+    cfg_file = _get_cfg_file(args)
+    try:
+        workers = int(args['--workers'])
+    except ValueError:
+        print(f'invalid number of workers: {args["--workers"]!r}',
+              file=sys.stderr)
+        return ExitCodes.CMDLINE.code
+    if args['--profile-file']:
+        print('option --profile-file only with one job', file=sys.stderr)
+        return ExitCodes.CMDLINE.code
+    try:
+        if not cfg_file:
+            raise ConfigError('A config file is required!')
+        try:
+            app_cfg = config.get_app_cfg(cfg_file)
+        except Exception as ex:
+            raise ConfigError(f'in app config: {ex}')
+        job_ids = runner.find_jobs(app_cfg, args['JOBID'])
+        runner.install_router(app_cfg['logging', 'log_level'])
+        results = runner.run_jobs(cfg_file, job_ids, workers,
+                                  args['--profile'])
+    except ConfigError as ex:
+        _handle_exception(verbose, ex)
+        return ex.code
+    except (KeyboardInterrupt, Terminated) as ex:
+        _handle_exception(verbose, ex)
+        return Terminated.code
+    descrs = {member.code: member.descr for member in ExitCodes}
+    print(f'{len(results)} job(s) finished:')
+    for job_id, result, status, exc in results:
+        print(f' {job_id}: {status} ({descrs.get(status, "?")})'
+              + (f'; {result}' if result is not None else ''))
+        if exc is not None and verbose:
+            print(f'{job_id}: {exc.__class__.__name__}: {exc}',
+                  file=sys.stderr)
+            if verbose == 2:
+                import traceback
+                traceback.print_exception(type(exc), exc, exc.__traceback__)
+    status = runner.combined_exit_code(r[2] for r in results)
+    _logger.debug('exit status=%d', status)
+    return status
+
+
+def _run_daemon(args):
+    from .daemon import Daemon
+    set_sigterm_handler()
+    cfg_file = _get_cfg_file(args)
+    try:
+        if not cfg_file:
+            raise ConfigError('A config file is required!')
+        Daemon(cfg_file).run()
+    except ConfigError as ex:
+        print(ex, file=sys.stderr)
+        return ConfigError.code
+    return ExitCodes.SUCCESS.code
+
+
+def _send_mail(args):
+    from . import mail
+    cfg_file = _get_cfg_file(args)
+    try:
+        if not cfg_file:
+            raise ConfigError('A config file is required!')
+        try:
+            app_cfg = config.get_app_cfg(cfg_file)
+        except Exception as ex:
+            raise ConfigError(f'in app config: {ex}')
+        if not app_cfg['mail', 'spool_dir']:
+            raise ConfigError('in app config: no spool_dir in section [mail]')
+        if not config.check_mail_config(app_cfg):
+            raise ConfigError('in app config: mail server not configured')
+    except ConfigError as ex:
+        print(ex, file=sys.stderr)
+        return ConfigError.code
+    sent, left = mail.flush_spool(app_cfg)
+    print(f'{sent} notification(s) sent, {left} left in spool directory')
+    return ExitCodes.FAILURE.code if left else ExitCodes.SUCCESS.code
+
+
 def _handle_exception(verbose, exc):
     if verbose:
         with suppress(AttributeError):
@@ -104,6 +212,10 @@ def _handle_exception(verbose, exc):
 
 
 def _get_hostkey(args):
+    import base64
+    import hashlib
+    from paramiko import Transport, SSHException
+    from .knownhosts import KnownHosts
     host = args['HOST']
     file = args['FILE']
     hash_ = args['--hash']
@@ -130,27 +242,25 @@ def _get_hostkey(args):
                 print('Type "yes" or "no"!')
             if a != 'no':
                 hostname = utils.format_knownhost(host, port)
-                hostkeys = HostKeys()
                 addkey = True
                 if os.path.exists(file):
-                    hostkeys.load(file)
+                    hostkeys = KnownHosts.read(file)
                     if hostkeys.lookup(hostname):
                         if hostkeys.check(hostname, hostkey):
                             print(f'Key for "{hostname}" exists'
                                   f' in file "{file}"')
                             addkey = False
                         else:
-                            del hostkeys[hostname]
+                            hostkeys.remove(hostname)
                             print(f'Key for "{hostname}" replaced'
                                   f' in file "{file}"')
                     else:
                         print(f'Key for "{hostname}" added in file "{file}"')
                 else:
+                    hostkeys = KnownHosts()
                     print(f'Key for "{hostname}" added in new file "{file}"')
                 if addkey:
-                    if hash_:
-                        hostname = HostKeys.hash_host(hostname)
-                    hostkeys.add(hostname, hostkey.get_name(), hostkey)
+                    hostkeys.add(hostname, hostkey, hash_)
                     hostkeys.save(file)
     except ConfigError as ex:
         print(ex, file=sys.stderr)
@@ -165,15 +275,14 @@ def _get_hostkey(args):
 
 
 def _del_hostkey(args):
+    from .knownhosts import KnownHosts
     host = args['HOST']
     file = args['FILE']
     try:
         port = strings.str2port(args['--port'])
         hostname = utils.format_knownhost(host, port)
-        hostkeys = HostKeys()
-        hostkeys.load(file)
-        if hostkeys.lookup(hostname):
-            del hostkeys[hostname]
+        hostkeys = KnownHosts.read(file)
+        if hostkeys.remove(hostname):
             hostkeys.save(file)
             print(f'Key for "{hostname}" deleted in file "{file}"')
         else:
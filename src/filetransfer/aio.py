@@ -0,0 +1,118 @@
+"""Asyncio API.
+
+The transfer is split into short steps by :func:`job.steps
+<filetransfer.job.steps>`: connecting, listing a directory, opening a
+file, transferring one chunk of a file and closing the connections. Each
+step runs in a thread of a shared, bounded
+:class:`~concurrent.futures.ThreadPoolExecutor`; waiting between retries
+is done with :func:`asyncio.sleep`. A job only occupies a thread for one
+step at a time, so the steps of many jobs are interleaved and hundreds
+of jobs can be awaited concurrently on one event loop, even while they
+transfer big files.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import job
+from .hooks import TransferHooks
+from .records import FileRecords
+from .stats import TransferStats
+
+_MAX_WORKERS = 16
+_DONE = object()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+try:
+    _get_running_loop = asyncio.get_running_loop
+except AttributeError:  # Python 3.6
+    _get_running_loop = asyncio.get_event_loop
+
+
+def _default_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(_MAX_WORKERS,
+                                           thread_name_prefix='filetransfer')
+        return _executor
+
+
+async def _aiter(it, hooks, executor):
+    loop = _get_running_loop()
+    executor = executor or _default_executor()
+
+    def close(fut):
+        if not fut.cancelled():
+            fut.exception()
+        executor.submit(it.close)
+
+    finished = False
+    try:
+        while True:
+            fut = loop.run_in_executor(executor, next, it, _DONE)
+            try:
+                value = await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                # the step is still running in its thread; stop the transfer
+                # and close the generator when the step has finished
+                finished = True
+                hooks.cancel()
+                fut.add_done_callback(close)
+                raise
+            except BaseException:
+                finished = True
+                raise
+            if value is _DONE:
+                finished = True
+                return
+            if value is None:
+                continue
+            if isinstance(value, float):
+                await asyncio.sleep(value)
+                continue
+            yield value
+    finally:
+        if not finished:
+            await loop.run_in_executor(executor, it.close)
+
+
+async def iter_transfer(job_cfg, skip=None, tstats=None, hooks=None,
+                        executor=None):
+    """Asynchronous version of :func:`filetransfer.job.iter_transfer`.
+
+    If the task is cancelled, the transfer is cancelled as with
+    :meth:`TransferHooks.cancel() <filetransfer.TransferHooks.cancel>`.
+
+    :param executor: executor for running the blocking steps;
+                     if ``None`` a shared executor will be used
+    :type executor: concurrent.futures.Executor
+    """
+    hooks = hooks or TransferHooks()
+    it = job.steps(job_cfg, skip, tstats, hooks)
+    agen = _aiter(it, hooks, executor)
+    try:
+        async for value in agen:
+            yield value
+    finally:
+        await agen.aclose()
+
+
+async def transfer(job_cfg, collect_data=False, hooks=None, executor=None):
+    """Asynchronous version of :func:`filetransfer.job.transfer`.
+
+    :return: job result
+    :rtype: filetransfer.JobResult
+    """
+    files = FileRecords(collect_data)
+    tstats = TransferStats()
+    agen = iter_transfer(job_cfg, None, tstats, hooks, executor)
+    try:
+        async for path, value in agen:
+            files.add(path, value)
+    finally:
+        await agen.aclose()
+    return job.create_result(files, tstats)
@@ -1,23 +1,149 @@
 """Base classes for source and target implementations."""
 
+import itertools
 import logging
 import os
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from contextlib import suppress
 from fnmatch import fnmatch
 
+from . import connpool, manifest, profiler, utils
+from .exceptions import ConnectError, Terminated
+from .loghandler import bind_to_job
+from .snapshot import Snapshot
+from .stats import ConnectStats
+from .utils import date_path_end
+from .watermark import Watermark
+
 _logger = logging.getLogger(__name__)
 
 _CHUNK_SIZE = 64 * 1024
+_LIST_AHEAD = 4  # pending listings per worker
 
 
 class Endpoint:
     """Base class for source and target implementations.
 
+    The attribute ``connect_stats`` is a list of
+    :class:`~filetransfer.stats.ConnectStats` (empty for local
+    filesystems), ``connect_time`` is the total time in seconds it took
+    to connect to the server. The attribute ``hooks`` may be set to
+    a :class:`~filetransfer.hooks.TransferHooks` object.
+
+    If the connection to the server is lost, it will be re-established
+    up to ``reconnects`` times per operation (see: :meth:`recover`).
+
     :param str path: the path
+    :param str url: the URL
+    :param int reconnects: max. number of reconnects per operation
     """
 
-    def __init__(self, path):
+    _role = None
+
+    def __init__(self, path, url=None, reconnects=0):
         self._path = path.rstrip('/')
+        self._url = url
+        self._reconnects = reconnects
+        self.connect_stats = []
+        self.hooks = None
+
+    @property
+    def connect_time(self):
+        """Return the total time for connecting in seconds."""
+        return sum(cstats.total for cstats in self.connect_stats)
+
+    def _acquire(self, key, connect, check):
+        """Return a connection from the pool or a new one.
+
+        The function ``connect`` is called with a
+        :class:`~filetransfer.stats.ConnectStats` object for
+        recording the phases of the setup.
+        """
+        cstats = ConnectStats(self._role, self._url)
+
+        def connect_():
+            cstats.start()
+            return connect(cstats)
+
+        conn = connpool.acquire(key, connect_, check)
+        if not cstats.phases:
+            cstats.reused = True
+            cstats.mark('reuse')
+        self.connect_stats.append(cstats)
+        _logger.info('Connected to %s %s in %.3fs (%s)', self._role,
+                     self._url, cstats.total, cstats.format_phases())
+        return conn
+
+    def connected(self, conn=None):
+        """Return ``True`` if the connection to the server is alive.
+
+        Always ``True`` for local filesystems.
+
+        :param conn: the connection (default: the connection of the
+                     endpoint)
+        """
+        return True
+
+    def is_transient(self, exc):
+        """Return ``True`` if an error is transient.
+
+        An operation that failed with a transient error (e.g. a timeout)
+        may succeed if it is retried later; permanent errors (e.g.
+        permission denied or no such file) will occur again.
+
+        :param Exception exc: the exception
+        :rtype: bool
+        """
+        if isinstance(exc, (FileNotFoundError, PermissionError,
+                            IsADirectoryError, NotADirectoryError)):
+            return False
+        return isinstance(exc, (TimeoutError, socket.timeout,
+                                ConnectionError, EOFError))
+
+    def _reconnect(self):
+        raise NotImplementedError(f'{self.__class__.__name__}._reconnect()')
+
+    def recover(self, attempt, exc):
+        """Re-establish the connection if it was lost.
+
+        The new connection is made after a delay with exponential backoff
+        (see: :func:`filetransfer.utils.retry_delay`).
+
+        :param int attempt: number of the failed attempt (starting with 0)
+        :param Exception exc: the exception of the failed operation
+        :return: ``True`` if the operation should be retried, ``False``
+                 if the connection is alive (i.e. the operation failed
+                 for another reason) or reconnecting is disabled
+        :raises filetransfer.ConnectError: if the connection could not
+                                           be re-established
+        """
+        if not self._reconnects or self.connected():
+            return False
+        if attempt >= self._reconnects:
+            raise ConnectError(f'Connection to {self._role} {self._url}'
+                               f' lost: {exc}') from exc
+        t = utils.retry_delay(attempt)
+        _logger.warning('Connection to %s %s lost (%s); reconnect in'
+                        ' %.1f seconds', self._role, self._url, exc, t)
+        time.sleep(t)
+        try:
+            self._reconnect()
+        except ConnectError as ex:
+            _logger.error('%s', ex)
+        return True
+
+    def _retry(self, func, *args):
+        """Call ``func(*args)`` and retry after a lost connection."""
+        for attempt in itertools.count():
+            try:
+                return func(*args)
+            except Exception as ex:
+                if not self.recover(attempt, ex):
+                    raise
 
     def __enter__(self):
         return self
@@ -45,13 +171,57 @@ class BaseSource(Endpoint):
     :type job_cfg: easimpconf.Config
     """
 
+    _role = 'source'
+
     def __init__(self, job_cfg):
-        super().__init__(job_cfg['source', 'path'])
+        super().__init__(job_cfg['source', 'path'], job_cfg['source_url'],
+                         job_cfg['job', 'reconnects'])
         _logger.info('Source: %s', job_cfg['source_url'])
         self._files = job_cfg['source', 'files']
         self._ignore = job_cfg['source', 'ignore']
         self._recursive = job_cfg['source', 'recursive']
         self._delete = job_cfg['source', 'delete']
+        self._list_workers = job_cfg['source', 'list_workers']
+        self._list_ordered = job_cfg['source', 'list_ordered']
+        self._paths = job_cfg['source_paths']
+        self._manifest = job_cfg['source', 'manifest']
+        self._manifest_entries = {}
+        self._order = job_cfg['source', 'order']
+        self._priority = job_cfg['source', 'priority'] or ()
+        self._snapshot_file = job_cfg['snapshot_file']
+        self._trust_dir_mtime = job_cfg['source', 'trust_dir_mtime']
+        self._snapshot = None
+        self._watermark_file = job_cfg['watermark_file']
+        self._watermark = None
+        self._min_age = job_cfg['source', 'min_age']
+        self._max_age = job_cfg['source', 'max_age']
+        self._date_pattern = job_cfg['source', 'date_pattern']
+        self._mtime_range = (None, None)
+        self._listed = False
+        # sizes and mtimes are only needed by snapshots, age filters and
+        # the order by size
+        self._stat_entries = bool(self._snapshot_file or self._watermark_file
+                                  or self._min_age or self._max_age or
+                                  self._order in ('largest', 'smallest'))
+        self.list_time = 0.0
+        self.open_time = 0.0
+        self.failed_dirs = set()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._snapshot is not None:
+            try:
+                self._snapshot.save()
+            except OSError as ex:
+                _logger.error('Snapshot not saved: %s', ex)
+        if self._watermark is not None:
+            if self._listed:
+                try:
+                    self._watermark.save()
+                except OSError as ex:
+                    _logger.error('Watermark not saved: %s', ex)
+            else:
+                _logger.info('Watermark not updated: listing incomplete')
+        super().__exit__(exc_type, exc_value, traceback)
 
     def _patterns(self, patterns):
         lst = []
@@ -70,44 +240,417 @@ class BaseSource(Endpoint):
         return False
 
     def _walk(self, path):
-        for entry in sorted(self._listdir(path)):
-            p = self._path_join(path, entry)
-            if self._recursive and self._isdir(p):
+        if self._paths is not None:
+            yield from self._walk_paths(path)
+            return
+        if self._manifest:
+            yield from self._walk_manifest(path)
+            return
+        mtime = None
+        if self._snapshot is not None and self._trust_dir_mtime:
+            mtime = self._retry(self._mtime, path)
+        if self._recursive and self._list_workers > 1:
+            yield from self._walk_parallel(path, mtime)
+            return
+        # iterative depth-first walk with a cursor (directory, entries,
+        # index of the next entry) per directory; because operations are
+        # retried after reconnecting, the walk resumes where it stopped
+        stack = [self._cursor(path, mtime)]
+        while stack:
+            cursor = stack[-1]
+            dir_path, entries, i = cursor
+            if i == len(entries):
+                stack.pop()
+                continue
+            cursor[2] = i + 1
+            name, is_dir, is_file, size, mtime = entries[i]
+            p = self._path_join(dir_path, name)
+            if is_dir and self._recursive:
                 try:
-                    yield from self._walk(p)
+                    stack.append(self._cursor(p, mtime))
+                except ConnectError:
+                    raise
                 except Exception as ex:
-                    yield p, ex
-            elif self._isfile(p):
-                yield p, None
+                    yield p, None, None, ex
+            elif is_file:
+                yield p, size, mtime, None
+
+    def _walk_paths(self, path):
+        # only the given files (e.g. reported by filetransfer.watch)
+        for name in sorted(self._paths):
+            p = self._path_join(path, name)
+            t = time.perf_counter()
+            is_file = self._retry(self._isfile, p)
+            self.list_time += time.perf_counter() - t
+            if is_file:
+                yield p, None, None, None
+
+    def _walk_manifest(self, path):
+        # only the files in the manifest; nothing is listed
+        def read(p):
+            with self._open(p, 'rb') as fh:
+                return fh.read()
+
+        t = time.perf_counter()
+        data = self._retry(read, self._path_join(path, self._manifest))
+        self.list_time += time.perf_counter() - t
+        path_len = len(self._path) + 1
+        for entry in manifest.parse(data, self._manifest.endswith('.json')):
+            p = self._path_join(path, *entry.path.split('/'))
+            if entry.size is not None or entry.checksum:
+                self._manifest_entries[p[path_len:]] = entry
+            yield p, entry.size, None, None
+
+    def _cursor(self, path, mtime=None):
+        hooks = self.hooks
+        if hooks is not None:
+            hooks.listing_started(path)
+        t = time.perf_counter()
+        entries = sorted(self._retry(self._list, path, mtime))
+        self.list_time += time.perf_counter() - t
+        if hooks is not None:
+            hooks.listing_finished(path, len(entries))
+        return [path, self._select(path, mtime, entries), 0]
+
+    def _list(self, path, mtime, conn=None):
+        snapshot = self._snapshot
+        if snapshot is not None and self._trust_dir_mtime:
+            entries = snapshot.entries(self._rel_path(path), mtime)
+            if entries is not None:
+                # the directory has not changed; only the mtimes of
+                # the subdirectories are needed
+                return [(name, True, False, None,
+                         self._mtime(self._path_join(path, name), conn))
+                        if is_dir else (name, is_dir, is_file, size, mt)
+                        for name, is_dir, is_file, size, mt in entries]
+        return self._scandir(path, conn)
+
+    def _select(self, path, mtime, entries):
+        # files that are unchanged (snapshot) or out of the age range
+        # (or without an mtime) are marked as non-files, directories
+        # outside the range (by their names, see option date_pattern) as
+        # non-directories
+        if self._snapshot is not None:
+            entries = self._snapshot.update(self._rel_path(path), mtime,
+                                            entries)
+        lo, hi = self._mtime_range
+        watermark = self._watermark
+        if watermark is not None and watermark.value is None:
+            watermark = None
+        if lo is None and hi is None and watermark is None:
+            return entries
+        result = []
+        for entry in entries:
+            name, is_dir, is_file, size, mt = entry
+            if is_file and mt is None:
+                _logger.debug('source skip file %s (no mtime)',
+                              self._rel_path(self._path_join(path, name)))
+                entry = (name, False, False, size, mt)
+            elif is_file:
+                if (lo is not None and mt <= lo or
+                        hi is not None and mt > hi or
+                        watermark is not None and watermark.passed(
+                            self._rel_path(self._path_join(path, name)),
+                            mt)):
+                    entry = (name, False, False, size, mt)
+            elif is_dir and self._date_pattern and (
+                    lo is not None or watermark is not None):
+                rel_path = self._rel_path(self._path_join(path, name))
+                end = date_path_end(rel_path.replace(os.sep, '/'),
+                                    self._date_pattern)
+                if end is not None and (
+                        lo is not None and end <= lo or
+                        watermark is not None and end < watermark.value):
+                    _logger.debug('source skip directory %s', rel_path)
+                    entry = (name, False, False, size, mt)
+            result.append(entry)
+        return result
+
+    def _rel_path(self, path):
+        return path[len(self._path) + 1:]
+
+    def _scandir(self, path, conn=None):
+        """Return a list of tuples (name, is_dir, is_file, size, mtime).
+
+        The size and mtime may be ``None`` if they are not needed.
+
+        :param str path: path of the directory
+        :param conn: a connection from :meth:`_worker_conn` (``None``:
+                     the connection of the endpoint)
+        """
+        entries = []
+        for name in self._listdir(path):
+            p = self._path_join(path, name)
+            is_dir = self._isdir(p)
+            entries.append((name, is_dir, not is_dir and self._isfile(p),
+                            None, None))
+        return entries
+
+    def _mtime(self, path, conn=None):
+        """Return the mtime of a file or directory."""
+        raise NotImplementedError(f'{self.__class__.__name__}._mtime()')
+
+    def _worker_conn(self):
+        """Return a new connection for listing in a worker thread."""
+        return None
+
+    def _release_conn(self, conn):
+        pass
+
+    def _walk_parallel(self, path, mtime):
+        # subdirectories are listed ahead of the walk by worker threads,
+        # each with its own connection; at most _LIST_AHEAD listings per
+        # worker are pending (running or done but not yet walked);
+        # with list_ordered the files are yielded in the same order as
+        # by the sequential walk, else in the order the listings are done
+        workers = self._list_workers
+        ahead = workers * _LIST_AHEAD
+        local = threading.local()
+        no_conn = threading.Event()
+        conns = []
+        queue = deque()
+        pending = {}
+        mtimes = {}
+
+        def scandir(p, mtime):
+            if no_conn.is_set():
+                raise ConnectError('no connection')
+            if not hasattr(local, 'conn'):
+                try:
+                    local.conn = self._worker_conn()
+                except ConnectError as ex:
+                    _logger.warning('Listing without workers: %s', ex)
+                    no_conn.set()
+                    raise
+                conns.append(local.conn)
+            conn = local.conn
+            try:
+                return sorted(self._list(p, mtime, conn))
+            except Exception:
+                if self.connected(conn):
+                    raise
+            # the directory is listed again by the walk
+            # with the connection of the endpoint
+            del local.conn
+            conns.remove(conn)
+            self._release_conn(conn)
+            raise ConnectError(f'Connection lost while listing {p}')
+
+        def start(p, mtime):
+            if hooks is not None:
+                hooks.listing_started(p)
+            return executor.submit(scandir, p, mtime)
+
+        def submit():
+            while queue and len(pending) < ahead:
+                p, mtime = queue.popleft()
+                pending[p] = start(p, mtime)
+                mtimes[p] = mtime
+
+        def subdirs(p, entries):
+            return [(self._path_join(p, e[0]), e[4]) for e in entries if e[1]]
+
+        def listing(p, mtime, future):
+            t = time.perf_counter()
+            try:
+                entries = future.result()
+            except ConnectError:
+                entries = sorted(self._retry(self._list, p, mtime))
+            self.list_time += time.perf_counter() - t
+            if hooks is not None:
+                hooks.listing_finished(p, len(entries))
+            entries = self._select(p, mtime, entries)
+            if self._list_ordered:
+                queue.extendleft(reversed(subdirs(p, entries)))
+            else:
+                queue.extend(subdirs(p, entries))
+            return entries
+
+        hooks = self.hooks
+        # the records of the workers go to the log of the job and the
+        # workers are profiled with the job
+        scandir = profiler.bind(bind_to_job(scandir))
+        entries = self._cursor(path, mtime)[1]
+        queue.extend(subdirs(path, entries))
+        executor = ThreadPoolExecutor(workers, thread_name_prefix='Lister')
+        try:
+            submit()
+            if self._list_ordered:
+                stack = [[path, entries, 0]]
+                while stack:
+                    cursor = stack[-1]
+                    dir_path, entries, i = cursor
+                    if i == len(entries):
+                        stack.pop()
+                        continue
+                    cursor[2] = i + 1
+                    name, is_dir, is_file, size, mtime = entries[i]
+                    p = self._path_join(dir_path, name)
+                    if is_dir:
+                        future = pending.pop(p, None)
+                        mtimes.pop(p, None)
+                        if future is None:
+                            queue.remove((p, mtime))
+                            future = start(p, mtime)
+                        try:
+                            stack.append([p, listing(p, mtime, future), 0])
+                        except ConnectError:
+                            raise
+                        except Exception as ex:
+                            yield p, None, None, ex
+                        finally:
+                            submit()
+                    elif is_file:
+                        yield p, size, mtime, None
+            else:
+                for name, is_dir, is_file, size, mtime in entries:
+                    if is_file:
+                        yield self._path_join(path, name), size, mtime, None
+                while pending:
+                    t = time.perf_counter()
+                    done = next(as_completed(pending.values()))
+                    self.list_time += time.perf_counter() - t
+                    p = next(k for k, v in pending.items() if v is done)
+                    del pending[p]
+                    try:
+                        entries = listing(p, mtimes.pop(p), done)
+                    except ConnectError:
+                        raise
+                    except Exception as ex:
+                        yield p, None, None, ex
+                        continue
+                    finally:
+                        submit()
+                    for name, is_dir, is_file, size, mtime in entries:
+                        if is_file:
+                            yield self._path_join(p, name), size, mtime, None
+        finally:
+            for future in pending.values():
+                future.cancel()
+            executor.shutdown()
+            for conn in conns:
+                self._release_conn(conn)
 
     def files(self):
         """Return an iterator that yields 2-tuples.
 
         The first element of the tuple is the file path relative to the source
         base path as a :class:`str`, the second a :term:`binary file` opened in
-        read-mode.
+        read-mode or the exception if the file could not be opened or the
+        directory could not be listed. The paths of such directories are
+        added to the set ``failed_dirs``.
+
+        The files are yielded in the order set with option ``order``; with
+        any order but ``name`` the whole source is listed first.
+
+        The time spent for listing directories is summed up in the attribute
+        ``list_time`` and the time for opening the last file is stored in the
+        attribute ``open_time`` (both in seconds).
 
         :return: iterator
         """
+        if self._paths is None:
+            if self._snapshot_file:
+                self._snapshot = Snapshot(self._snapshot_file, self._url,
+                                          self._path_join)
+            if self._watermark_file:
+                self._watermark = Watermark(self._watermark_file, self._url)
+            self._mtime_range = self._age_range()
         files = self._patterns(self._files)
         ignore = self._patterns(self._ignore)
         path_len = len(self._path) + 1
-        for file_path, exc in self._walk(self._path):
+        listed = True
+        walk = self._walk(self._path)
+        if self._order != 'name':
+            walk = self._ordered(walk)
+        for file_path, _, mtime, exc in walk:
+            if exc is not None:
+                listed = False
             if (self._match(files, file_path) and
                     not self._match(ignore, file_path)):
                 _logger.debug('source files file_path=%s', file_path)
                 if exc is not None:
                     _logger.error('Source: %s (%s)', file_path, exc)
+                    self.failed_dirs.add(file_path[path_len:])
                     yield file_path[path_len:], exc
                     continue
+                if self._watermark is not None and mtime is not None:
+                    self._watermark.selected(file_path[path_len:], mtime)
                 try:
-                    yield file_path[path_len:], self._open(file_path, 'rb')
-                    if self._delete:
-                        with suppress(Exception):
-                            self._remove(file_path)
+                    reader = self.open(file_path[path_len:])
+                except ConnectError:
+                    raise
                 except Exception as ex:
                     _logger.error('Source: %s (%s)', file_path, ex)
                     yield file_path[path_len:], ex
+                else:
+                    yield file_path[path_len:], reader
+        self._listed = listed
+
+    def _ordered(self, walk):
+        # the whole source is listed before the first file is opened;
+        # the sort is stable, so files with the same key stay in name order
+        if self._order == 'priority':
+            classes = [self._patterns((p,)) for p in self._priority]
+
+            def key(item):
+                return next((i for i, patterns in enumerate(classes)
+                             if self._match(patterns, item[0])),
+                            len(classes))
+        else:
+            sign = -1 if self._order == 'largest' else 1
+
+            def key(item):
+                # files with unknown sizes last
+                size = item[1]
+                return (size is None, sign * (size or 0))
+
+        yield from sorted(walk, key=key)
+
+    def _age_range(self):
+        # range (lo, hi] of the mtimes of the files to transfer; the
+        # watermark is checked separately (see: _select)
+        now = time.time()
+        return (now - self._max_age if self._max_age else None,
+                now - self._min_age if self._min_age else None)
+
+    def open(self, path):
+        """Open a file for reading.
+
+        The time it took is stored in the attribute ``open_time``.
+
+        If the file is in the manifest (option ``manifest``) with a size or
+        checksum, they are verified while the file is read.
+
+        :param str path: file path relative to the source base path
+        :return: :term:`binary file` opened in read-mode
+        """
+        t = time.perf_counter()
+        reader = self._retry(self._open, self._path_join(self._path, path),
+                             'rb')
+        self.open_time = time.perf_counter() - t
+        entry = self._manifest_entries.get(path)
+        if entry is not None:
+            reader = manifest.VerifyingReader(reader, entry)
+        return reader
+
+    def transferred(self, path):
+        """Record a file as transferred.
+
+        The file is recorded in the snapshot (option ``snapshot``) and
+        for the watermark (option ``newer_than_last_run``) and deleted if
+        option ``delete`` is set. Errors while deleting are
+        ignored.
+
+        :param str path: file path relative to the source base path
+        """
+        if self._snapshot is not None:
+            self._snapshot.confirm(path)
+        if self._watermark is not None:
+            self._watermark.transferred(path)
+        if self._delete:
+            with suppress(Exception):
+                self._remove(self._path_join(self._path, path))
 
 
 class BaseTarget(Endpoint):
@@ -128,8 +671,11 @@ class BaseTarget(Endpoint):
     :type job_cfg: easimpconf.Config
     """
 
+    _role = 'target'
+
     def __init__(self, job_cfg):
-        super().__init__(job_cfg['target', 'path'])
+        super().__init__(job_cfg['target', 'path'], job_cfg['target_url'],
+                         job_cfg['job', 'reconnects'])
         _logger.info('Target: %s', job_cfg['target_url'])
         self._temp = job_cfg['target', 'temp']
 
@@ -146,7 +692,7 @@ class BaseTarget(Endpoint):
                 return self._path_join(d, self._path_base(file_path))
         return None
 
-    def store(self, path, reader):
+    def store(self, path, reader, stats=None):
         """Save file.
 
         See: :meth:`BaseSource.files`.
@@ -154,6 +700,27 @@ class BaseTarget(Endpoint):
         :param str path: file path relative to the target base path
         :param reader: file reader
         :type reader: :term:`binary file` opened in read-mode
+        :param stats: if given the size, the time to first byte and
+                      the rename time will be set
+        :type stats: filetransfer.stats.FileStats
+        :return: exception if the file could not be saved else ``None``
+        """
+        steps = self.store_steps(path, reader, stats)
+        while True:
+            try:
+                next(steps)
+            except StopIteration as ex:
+                return ex.value
+
+    def store_steps(self, path, reader, stats=None):
+        """Save file in steps.
+
+        Like :meth:`store` but as a generator that yields ``None`` after
+        each chunk, so that the caller can run each chunk as a separate
+        step. The return value of the generator is the return value of
+        :meth:`store`.
+
+        .. versionadded:: 0.12.0
         """
         try:
             file_path = self._path_join(self._path, path)
@@ -163,11 +730,47 @@ class BaseTarget(Endpoint):
             _logger.debug('target store tmp_path=%s', tmp_path)
             if self._path_exists(file_path):
                 self._remove(file_path)
+            hooks = self.hooks
+            cancelled = False
             with self._open(tmp_path or file_path, 'wb') as fh:
-                while fh.write(reader.read(_CHUNK_SIZE)):
-                    pass
+                # SFTPFile.write() returns None, so its return value
+                # cannot be used for ending the loop
+                t = time.perf_counter()
+                chunk = reader.read(_CHUNK_SIZE)
+                ttfb = time.perf_counter() - t
+                size = 0
+                if hooks is not None:
+                    next_progress = time.monotonic() + hooks.progress_interval
+                while chunk:
+                    fh.write(chunk)
+                    size += len(chunk)
+                    yield
+                    if hooks is not None:
+                        if hooks.cancelled:
+                            cancelled = True
+                            break
+                        now = time.monotonic()
+                        if now >= next_progress:
+                            hooks.file_progress(path, size)
+                            next_progress = now + hooks.progress_interval
+                    chunk = reader.read(_CHUNK_SIZE)
+            if cancelled:
+                with suppress(Exception):
+                    self._remove(tmp_path or file_path)
+                raise Terminated('cancelled')
+            rename_time = 0.0
             if tmp_path:
+                t = time.perf_counter()
                 self._rename(tmp_path, file_path)
+                rename_time = time.perf_counter() - t
+            if stats is not None:
+                stats.size = size
+                stats.ttfb = ttfb
+                stats.rename_time = rename_time
         except Exception as ex:
+            if isinstance(ex, manifest.VerificationError):
+                # do not leave a file with wrong contents
+                with suppress(Exception):
+                    self._remove(tmp_path or file_path)
             _logger.error('Target: %s (%s)', file_path, ex)
             return ex
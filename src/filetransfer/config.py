@@ -1,9 +1,14 @@
 """Configuration module."""
 
 import configparser
+import functools
+import hashlib
 import io
+import json
 import logging
 import os
+import re
+from contextlib import suppress
 from datetime import datetime
 from email.utils import parseaddr
 from pathlib import Path
@@ -14,8 +19,9 @@ from salmagundi import strings
 
 from . import const
 from .exceptions import ConfigError
-from .loghandler import LogHandler
-from .utils import read_resource
+from .loghandler import LogHandler, LogRouter
+from .schedule import parse_schedule
+from .utils import parse_duration, read_resource
 
 _LOG_FILE_FORMAT = '{:%Y%m%d-%H%M%S}.log'
 _SFTP_KEY_TYPES = {
@@ -25,16 +31,23 @@ _SFTP_KEY_TYPES = {
     'ED25519': ('key_ed25519_file', 'key_ed25519_pass')
 }
 _CONFIG_ERRORS = (FileNotFoundError, configparser.Error, easimpconf.Error)
+_SECTION_RE = re.compile(r'\[(.+)\]\s*$')
+
+_hosts_cache = {}  # path -> (key, index)
 
 _logger = logging.getLogger(__name__)
 
 
-def configure(cfg_file, job_id, *, activate_logging=False):
+def configure(cfg_file, job_id, *, activate_logging=False,
+              source_paths=None):
     """Configure the application.
 
     :param cfg_file: path to configuration file
     :type cfg_file: term:`path-like object`
     :param str job_id: the job id
+    :param source_paths: if given, only these files (paths relative to
+                         the source path) are transferred instead of
+                         all files in the source directory
     :returns: application and job configurations
     :rtype: (easimpconf.Config, easimpconf.Config)
     :raises ConfigError: if there is a problem with the configuration
@@ -46,19 +59,15 @@ def configure(cfg_file, job_id, *, activate_logging=False):
         if not cfg_file:
             raise ConfigError('A config file is required!')
         cfg_file = Path(cfg_file).expanduser()
-        app_config_spec = _load_spec('app_config_spec.ini')
         try:
-            app_cfg = easimpconf.configure(cfg_file,
-                                           io.StringIO(app_config_spec),
-                                           create_properties=False,
-                                           converters=_CONVS)
+            app_cfg = get_app_cfg(cfg_file)
         except _CONFIG_ERRORS as ex:
             raise ConfigError(f'in app config: {ex}')
         _configure_logging(app_cfg, job_id)
         log_enabled = not app_cfg['logging', 'disabled']
         _logger.info('Job %r started', job_id)
         app_cfg.add('start_time', datetime.now())
-        mail_config_ok = _check_mail_config(app_cfg)
+        mail_config_ok = check_mail_config(app_cfg)
         app_cfg.add('mail_config_ok', mail_config_ok)
         _set_default_port(app_cfg, ('mail', 'host'), 'smtp')
         _debug_config('APP CONFIG', app_cfg)
@@ -71,12 +80,23 @@ def configure(cfg_file, job_id, *, activate_logging=False):
             raise ConfigError(f'in job config: {ex}')
         log_enabled = app_cfg['log_handler'].enabled
         if log_enabled:
-            logging.getLogger().setLevel(job_cfg['job', 'log_level'])
+            if LogRouter.installed():
+                app_cfg['log_handler'].setLevel(job_cfg['job', 'log_level'])
+            else:
+                logging.getLogger().setLevel(job_cfg['job', 'log_level'])
             app_cfg['log_handler'].purge(job_cfg['job', 'log_level'])
         if activate_logging:
             app_cfg['log_handler'].activate()
         job_cfg.add('job_id', job_id)
         job_cfg.add('job_cfg_file', job_cfg_file)
+        job_cfg.add('source_paths', source_paths)
+        state_dir = app_cfg['global', 'state_dir']
+        job_cfg.add('snapshot_file',
+                    state_dir / f'{job_id}.snapshot.gz'
+                    if job_cfg['source', 'snapshot'] else None)
+        job_cfg.add('watermark_file',
+                    state_dir / f'{job_id}.watermark'
+                    if job_cfg['source', 'newer_than_last_run'] else None)
         if not job_cfg['job', 'name']:
             job_cfg['job', 'name'] = job_id
         _merge_notify_addrs(app_cfg, job_cfg, mail_config_ok)
@@ -102,6 +122,13 @@ def configure(cfg_file, job_id, *, activate_logging=False):
             raise ConfigError(ex)
 
 
+def get_app_cfg(cfg_file):
+    """Return application configuration object."""
+    app_config_spec = _load_spec('app_config_spec.ini')
+    return easimpconf.configure(cfg_file, io.StringIO(app_config_spec),
+                                create_properties=False, converters=_CONVS)
+
+
 def get_job_cfg(conf, app_cfg=None):
     """Return job configuration object."""
     job_config_spec = _load_spec('job_config_spec.ini')
@@ -109,6 +136,18 @@ def get_job_cfg(conf, app_cfg=None):
                                    create_properties=False, converters=_CONVS)
     if job_cfg['job', 'collect_data'] is easimpconf.NOTFOUND and app_cfg:
         job_cfg['job', 'collect_data'] = app_cfg['global', 'collect_data']
+    if job_cfg['source', 'watch'] and job_cfg['source', 'host_id']:
+        raise ConfigError('in job config: watch is only supported for'
+                          ' local sources')
+    if (job_cfg['source', 'order'] == 'priority' and
+            not job_cfg['source', 'priority']):
+        raise ConfigError('in job config: order priority used but no'
+                          ' priority patterns')
+    for key in ('snapshot', 'newer_than_last_run'):
+        if job_cfg['source', key] and not (
+                app_cfg and app_cfg['global', 'state_dir']):
+            raise ConfigError(f'in job config: {key} used but no state_dir'
+                              ' in app config')
     if job_cfg['job', 'single_instance']:
         if not app_cfg['global', 'locks_dir']:
             raise ConfigError('in job config: single_instance used but no'
@@ -135,11 +174,22 @@ def _debug_config(title, cfg):
         _logger.debug('%s:\n%s', title, '\n'.join(lines))
 
 
-def _check_mail_config(app_cfg):
-    if any(t[2] is not easimpconf.NOTFOUND for t in app_cfg if t[0] == 'mail'):
+def check_mail_config(app_cfg):
+    """Check the mail server configuration.
+
+    :param app_cfg: the application configuration
+    :type app_cfg: easimpconf.Config
+    :return: ``True`` if a mail server is configured
+    :rtype: bool
+    :raises ConfigError: if the mail server configuration is incomplete
+                         or invalid
+    """
+    if any(t[2] is not easimpconf.NOTFOUND
+           for t in app_cfg if t[0] == 'mail' and t[1] != 'spool_dir'):
         if (app_cfg['mail', 'security'] is None or
             not all(t[2] is not easimpconf.NOTFOUND
-                    for t in app_cfg if t[0] == 'mail' and t[1] != 'security')):
+                    for t in app_cfg if t[0] == 'mail' and
+                    t[1] not in ('security', 'spool_dir'))):
             raise ConfigError('in app config: incomplete or invalid mail'
                               ' server configuration')
         return True
@@ -176,19 +226,99 @@ def _configure_logging(app_cfg, job_id):
     else:
         import warnings
         warnings.simplefilter('ignore')
-    log_handler = LogHandler(log_path)
-    logging.basicConfig(level=logging.NOTSET,
-                        format=app_cfg['logging', 'msg_format'],
-                        handlers=[log_handler])
+    log_handler = LogHandler(log_path,
+                             app_cfg['logging', 'buffered'],
+                             app_cfg['logging', 'flush_interval'])
+    router = LogRouter.installed()
+    if router:
+        log_handler.setFormatter(
+            logging.Formatter(app_cfg['logging', 'msg_format']))
+        router.register(log_handler)
+    else:
+        logging.basicConfig(level=logging.NOTSET,
+                            format=app_cfg['logging', 'msg_format'],
+                            handlers=[log_handler])
     app_cfg.add('log_handler', log_handler)
     app_cfg.add('log_file', log_file)
+    app_cfg.add('log_path', log_path)
+
+
+@functools.lru_cache(maxsize=None)
+def _read_spec(specfile):
+    return read_resource(specfile)
 
 
 def _load_spec(specfile, host_id=None):
-    s = read_resource(specfile)
+    s = _read_spec(specfile)
     return s.replace('*HOST_ID*', host_id) if host_id else s
 
 
+def _hosts_index(hosts_cfg_file, cache_dir=None):
+    """Return the sections of a hosts configuration file.
+
+    The result is a :class:`dict` that maps a host id to the text of
+    its section (preceded by the ``DEFAULT`` section if there is one)
+    or ``None`` if the file could not be indexed. It is cached in memory
+    and, if ``cache_dir`` is set, on disk; the cache key is the path,
+    modification time and size of the file.
+    """
+    path = Path(hosts_cfg_file).expanduser().resolve()
+    st = path.stat()
+    key = [str(path), st.st_mtime_ns, st.st_size]
+    cached = _hosts_cache.get(key[0])
+    if cached and cached[0] == key:
+        return cached[1]
+    cache_file = None
+    index = None
+    if cache_dir:
+        name = hashlib.sha1(key[0].encode()).hexdigest()[:16]
+        cache_file = Path(cache_dir) / f'hosts-{name}.json'
+        with suppress(OSError, ValueError, KeyError):
+            with cache_file.open() as fh:
+                data = json.load(fh)
+            if data['key'] == key:
+                index = data['sections']
+                _logger.debug('hosts index loaded from %s', cache_file)
+    if index is None:
+        index = _split_sections(path.read_text())
+        if cache_file:
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+                with tmp_file.open('w') as fh:
+                    json.dump({'key': key, 'sections': index}, fh)
+                os.replace(tmp_file, cache_file)
+            except OSError as ex:
+                _logger.debug('hosts index not cached: %s', ex)
+    _hosts_cache[key[0]] = (key, index)
+    return index
+
+
+def _split_sections(text):
+    sections = {}
+    name, lines = None, []
+    for line in text.splitlines(keepends=True):
+        mo = _SECTION_RE.match(line)
+        if mo:
+            if name is not None:
+                sections[name] = ''.join(lines)
+            name, lines = mo.group(1), []
+            if name in sections:
+                return None
+        lines.append(line)
+    if name is not None:
+        sections[name] = ''.join(lines)
+    default = sections.pop(configparser.DEFAULTSECT, '')
+    return {name: default + text for name, text in sections.items()}
+
+
+def _host_conf(hosts_cfg_file, host_id, cache_dir):
+    index = _hosts_index(hosts_cfg_file, cache_dir)
+    if index is None:
+        return hosts_cfg_file
+    return io.StringIO(index.get(host_id, ''))
+
+
 def get_host_cfg(conf, host_id, app_cfg=None):
     """Return host configuration object."""
     host_spec = _load_spec('host_config_spec.ini', host_id)
@@ -201,6 +331,8 @@ def get_host_cfg(conf, host_id, app_cfg=None):
     elif host_cfg[host_id, 'password'] is easimpconf.NOTFOUND:
         raise ConfigError(f'in host config {host_id!r}: password required')
     host_cfg.add('host_id', host_id)
+    host_cfg.add('cache_dir', app_cfg['global', 'cache_dir']
+                 if app_cfg else None)
     return host_cfg
 
 
@@ -228,7 +360,9 @@ def _host_config(host_kind, app_cfg, job_cfg):
         if not hosts_cfg_file:
             raise ConfigError('no hosts configuration file')
         try:
-            host_cfg = get_host_cfg(hosts_cfg_file, host_id, app_cfg)
+            conf = _host_conf(hosts_cfg_file, host_id,
+                              app_cfg['global', 'cache_dir'])
+            host_cfg = get_host_cfg(conf, host_id, app_cfg)
             job_cfg.add(f'{host_kind}_host_cfg', host_cfg)
             _debug_config(f'{host_kind.upper()} HOST CONFIG', host_cfg)
         except _CONFIG_ERRORS as ex:
@@ -312,6 +446,15 @@ _CONVS = {
     'posint': easimpconf.convert_predicate(lambda x: x >= 0,
                                            converter=int,
                                            default=0),
+    'schedule': parse_schedule,
+    'duration': parse_duration,
+    'order': easimpconf.convert_choice(('name', 'largest', 'smallest',
+                                        'priority'),
+                                       converter=str.lower,
+                                       default=ValueError),
+    'profmode': easimpconf.convert_choice(('cprofile', 'sampling'),
+                                          converter=str.lower,
+                                          default=ValueError),
     'keytype': easimpconf.convert_choice(_SFTP_KEY_TYPES,
                                          converter=str.upper,
                                          default=ValueError),
@@ -0,0 +1,147 @@
+"""Pool of idle server connections.
+
+The pool is only enabled in daemon mode. Without it every endpoint
+opens a new connection and closes it when the transfer is done.
+"""
+
+import logging
+import threading
+import time
+from contextlib import suppress
+
+_MAX_IDLE_PER_KEY = 2
+
+_logger = logging.getLogger(__name__)
+
+_pool = None
+
+
+class ConnectionPool:
+    """Keep idle connections open for reuse.
+
+    :param float idle_timeout: seconds after which an idle connection
+                               will be closed
+    """
+
+    def __init__(self, idle_timeout):
+        self._idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = {}  # key -> [(conn, close, last_used), ...]
+
+    def get(self, key, check):
+        """Return an idle connection for ``key`` or ``None``.
+
+        :param key: connection key
+        :param check: function that returns ``True`` if a connection
+                      is still usable
+        """
+        while True:
+            with self._lock:
+                lst = self._idle.get(key)
+                if not lst:
+                    return None
+                conn, close, last_used = lst.pop()
+            if time.monotonic() - last_used < self._idle_timeout:
+                try:
+                    if check(conn):
+                        _logger.debug('reusing connection %s', key[:3])
+                        return conn
+                except Exception:
+                    pass
+            with suppress(Exception):
+                close(conn)
+
+    def put(self, key, conn, close):
+        """Put a connection into the pool.
+
+        :param key: connection key
+        :param conn: the connection
+        :param close: function for closing the connection
+        :return: ``False`` if the pool is full for ``key``
+        :rtype: bool
+        """
+        with self._lock:
+            lst = self._idle.setdefault(key, [])
+            if len(lst) >= _MAX_IDLE_PER_KEY:
+                return False
+            lst.append((conn, close, time.monotonic()))
+            return True
+
+    def expire(self):
+        """Close connections that have been idle for too long."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for key, lst in list(self._idle.items()):
+                keep = []
+                for t in lst:
+                    if now - t[2] < self._idle_timeout:
+                        keep.append(t)
+                    else:
+                        expired.append(t)
+                if keep:
+                    self._idle[key] = keep
+                else:
+                    del self._idle[key]
+        for conn, close, _ in expired:
+            with suppress(Exception):
+                close(conn)
+
+    def close(self):
+        """Close all connections."""
+        with self._lock:
+            lsts, self._idle = list(self._idle.values()), {}
+        for lst in lsts:
+            for conn, close, _ in lst:
+                with suppress(Exception):
+                    close(conn)
+
+
+def enable(idle_timeout):
+    """Enable the connection pool.
+
+    :param float idle_timeout: seconds after which an idle connection
+                               will be closed
+    :return: the pool
+    :rtype: ConnectionPool
+    """
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(idle_timeout)
+    return _pool
+
+
+def disable():
+    """Disable the connection pool and close all idle connections."""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def acquire(key, connect, check):
+    """Return a pooled connection or a new one.
+
+    :param key: connection key
+    :param connect: function that creates a new connection
+    :param check: function that returns ``True`` if a connection
+                  is still usable
+    """
+    pool = _pool
+    if pool is not None:
+        conn = pool.get(key, check)
+        if conn is not None:
+            return conn
+    return connect()
+
+
+def release(key, conn, close):
+    """Return a connection to the pool or close it.
+
+    :param key: connection key
+    :param conn: the connection
+    :param close: function for closing the connection
+    """
+    pool = _pool
+    if pool is None or not pool.put(key, conn, close):
+        close(conn)
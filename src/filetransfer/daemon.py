@@ -0,0 +1,256 @@
+"""Daemon mode.
+
+The daemon loads all job configurations from ``jobs_dir`` that have
+a ``[job] schedule`` option and runs the jobs accordingly. Idle server
+connections are kept open for reuse (see: :mod:`filetransfer.connpool`).
+
+The source directories of jobs with the option ``[source] watch`` are
+watched (see: :mod:`filetransfer.watch`): such a job runs once when it
+is loaded and then each time files were completed, but only for these
+files. If events were lost, the job runs for all files again.
+If a mail spool directory is configured, the spooled notifications are
+sent after each job (see: :func:`filetransfer.mail.flush_spool`).
+"""
+
+import configparser
+import logging
+import select
+import socket
+import threading
+import time
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from . import config, connpool, mail, runner
+from .exceptions import ConfigError, Terminated
+from .hooks import TransferHooks
+from .schedule import parse_schedule
+from .watch import Watcher
+
+_MAX_SLEEP = 60.0  # seconds; jobs_dir is rescanned at least this often
+_REWATCH_INTERVAL = 5.0  # seconds; for watched directories that were removed
+
+_logger = logging.getLogger(__name__)
+
+
+class _ScheduledJob:
+    __slots__ = ('job_id', 'mtime', 'schedule', 'next_time', 'future',
+                 'watcher', 'paths')
+
+    def __init__(self, job_id, mtime, schedule, now, watcher=None):
+        self.job_id = job_id
+        self.mtime = mtime
+        self.schedule = schedule
+        self.next_time = schedule.next_time(now) if schedule else datetime.max
+        self.future = None
+        self.watcher = watcher
+        self.paths = set()
+        if watcher is not None:
+            # run for all files first
+            watcher.rescan = True
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.close()
+
+    @property
+    def running(self):
+        return self.future is not None and not self.future.done()
+
+
+class Daemon:
+    """Run scheduled jobs.
+
+    :param cfg_file: the application configuration file
+    :type cfg_file: :term:`path-like object`
+    :raises ConfigError: if there is a problem with the configuration
+    """
+
+    def __init__(self, cfg_file):
+        self._cfg_file = cfg_file
+        try:
+            self._app_cfg = config.get_app_cfg(cfg_file)
+        except Exception as ex:
+            raise ConfigError(f'in app config: {ex}')
+        self._jobs = {}
+        self._unscheduled = {}  # job_id -> mtime
+        self._hooks = TransferHooks()  # for stopping the running jobs
+        self._mail_executor = None
+        self._mail_future = None
+        self._mail_lock = threading.Lock()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+
+    def run(self):
+        """Run the daemon until it is terminated."""
+        runner.install_router(self._app_cfg['logging', 'log_level'])
+        pool = connpool.enable(self._app_cfg['daemon', 'idle_timeout'])
+        executor = ThreadPoolExecutor(
+            max(1, self._app_cfg['daemon', 'max_workers']))
+        if self._app_cfg['mail', 'spool_dir']:
+            self._mail_executor = ThreadPoolExecutor(1)
+        _logger.info('Daemon started')
+        try:
+            while True:
+                now = datetime.now()
+                self._load_jobs(now)
+                for sjob in self._jobs.values():
+                    if sjob.next_time > now:
+                        continue
+                    if sjob.running:
+                        _logger.warning('Job %r still running; skipped',
+                                        sjob.job_id)
+                    else:
+                        sjob.future = executor.submit(self._run_job,
+                                                      sjob.job_id)
+                        if sjob.watcher is not None:
+                            sjob.watcher.rescan = False
+                            sjob.paths.clear()
+                    sjob.next_time = sjob.schedule.next_time(now)
+                for sjob in self._jobs.values():
+                    if sjob.watcher is None or sjob.running:
+                        continue
+                    if sjob.watcher.rescan:
+                        sjob.watcher.rescan = False
+                        sjob.paths.clear()
+                        _logger.info('Job %r: rescanning source', sjob.job_id)
+                        sjob.future = executor.submit(self._run_job,
+                                                      sjob.job_id)
+                    elif sjob.paths:
+                        paths, sjob.paths = sjob.paths, set()
+                        _logger.info('Job %r: %d file(s) completed',
+                                     sjob.job_id, len(paths))
+                        sjob.future = executor.submit(self._run_job,
+                                                      sjob.job_id, paths)
+                self._flush_mail()
+                pool.expire()
+                self._sleep()
+        except (KeyboardInterrupt, Terminated) as ex:
+            _logger.info('Daemon terminated: %s', ex.__class__.__name__)
+            runner.cancel(self._hooks, [sjob.future
+                                        for sjob in self._jobs.values()
+                                        if sjob.future is not None])
+        finally:
+            executor.shutdown(wait=True)
+            if self._mail_executor is not None:
+                self._mail_executor.shutdown(wait=True)
+            for sjob in self._jobs.values():
+                sjob.close()
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+            connpool.disable()
+            _logger.info('Daemon stopped')
+
+    def _sleep(self):
+        t = _MAX_SLEEP
+        if self._jobs:
+            next_time = min(sjob.next_time for sjob in self._jobs.values())
+            t = min(t, (next_time - datetime.now()).total_seconds())
+        if t <= 0:
+            return
+        watchers = [sjob.watcher for sjob in self._jobs.values()
+                    if sjob.watcher is not None]
+        if not watchers:
+            time.sleep(t)
+            return
+        if not all(w.watching for w in watchers):
+            # a removed directory does not generate events
+            t = min(t, _REWATCH_INTERVAL)
+        ready = select.select(watchers + [self._wakeup_r], [], [], t)[0]
+        if self._wakeup_r in ready:
+            self._wakeup_r.recv(4096)
+        for sjob in self._jobs.values():
+            if sjob.watcher in ready:
+                sjob.paths.update(sjob.watcher.read())
+            elif sjob.watcher is not None and not sjob.watcher.watching:
+                if sjob.watcher.rewatch():
+                    _logger.info('Job %r watching again', sjob.job_id)
+
+    def _wakeup(self):
+        with suppress(OSError):
+            self._wakeup_w.send(b'\0')
+
+    def _load_jobs(self, now):
+        jobs_dir = self._app_cfg['global', 'jobs_dir']
+        ext = self._app_cfg['global', 'job_cfg_ext']
+        jobs, unscheduled = {}, {}
+        for path in sorted(jobs_dir.glob('*' + ext)):
+            job_id = path.name[:-len(ext)]
+            try:
+                mtime = path.stat().st_mtime_ns
+            except OSError:
+                continue
+            if self._unscheduled.get(job_id) == mtime:
+                unscheduled[job_id] = mtime
+                continue
+            sjob = self._jobs.get(job_id)
+            if sjob is None or sjob.mtime != mtime:
+                schedule, watch = _read_job(path)
+                watcher = _create_watcher(job_id, *watch) if watch else None
+                if schedule is None and watcher is None:
+                    unscheduled[job_id] = mtime
+                    continue
+                new = _ScheduledJob(job_id, mtime, schedule, now, watcher)
+                if sjob is not None:
+                    new.future = sjob.future
+                    sjob.close()
+                if schedule is not None:
+                    _logger.info('Job %r scheduled: %r (next run: %s)',
+                                 job_id, schedule, new.next_time)
+                if watcher is not None:
+                    _logger.info('Job %r watching: %s', job_id, watch[0])
+                sjob = new
+            jobs[job_id] = sjob
+        for job_id in self._jobs.keys() - jobs.keys():
+            self._jobs[job_id].close()
+            _logger.info('Job %r removed', job_id)
+        self._jobs = jobs
+        self._unscheduled = unscheduled
+
+    def _run_job(self, job_id, source_paths=None):
+        _, status, _ = runner.run_job(self._cfg_file, job_id,
+                                      source_paths=source_paths,
+                                      hooks=self._hooks)
+        _logger.info('Job %r finished: exit_code=%s', job_id, status)
+        self._flush_mail()
+        self._wakeup()
+        return status
+
+    def _flush_mail(self):
+        with self._mail_lock:
+            if self._mail_executor is None or (
+                    self._mail_future is not None and
+                    not self._mail_future.done()):
+                return
+            self._mail_future = self._mail_executor.submit(
+                mail.flush_spool, self._app_cfg)
+
+
+def _read_job(path):
+    """Return the schedule and the watch settings of a job.
+
+    :return: tuple (schedule or None, (path, recursive) or None)
+    """
+    cp = configparser.ConfigParser(interpolation=None)
+    try:
+        cp.read(path)
+        s = cp.get('job', 'schedule', fallback='').strip()
+        schedule = parse_schedule(s) if s else None
+        watch = None
+        if cp.getboolean('source', 'watch', fallback=False):
+            if cp.get('source', 'host_id', fallback=''):
+                raise ValueError('watch is only supported for local sources')
+            watch = (cp.get('source', 'path'),
+                     cp.getboolean('source', 'recursive', fallback=False))
+        return schedule, watch
+    except (configparser.Error, ValueError) as ex:
+        _logger.error('Job config %s: %s', path, ex)
+        return None, None
+
+
+def _create_watcher(job_id, path, recursive):
+    try:
+        return Watcher(path, recursive)
+    except OSError as ex:
+        _logger.error('Job %r: cannot watch %s: %s', job_id, path, ex)
+        return None
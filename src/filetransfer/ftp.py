@@ -9,6 +9,7 @@ from functools import partial
 
 import ftputil
 
+from . import connpool, utils
 from .base import BaseSource, BaseTarget
 from .exceptions import ConnectError
 
@@ -29,12 +30,16 @@ class _Ftp:
         super().__init__(job_cfg)
         self._host_cfg = host_cfg
         self._tls = tls
-        self._conn = self._connect()
+        self._conn = self._acquire(self._pool_key(), self._connect,
+                                   self._check_conn)
+        self._bind()
+
+    def _bind(self):
         self._path_join = self._conn.path.join
         self._open = self._conn.open
         self._remove = self._conn.remove
 
-    def _connect(self):
+    def _connect(self, cstats):
         host_id = self._host_cfg['host_id']
         host, port = self._host_cfg[host_id, 'host']
         user = self._host_cfg[host_id, 'user']
@@ -43,16 +48,40 @@ class _Ftp:
         passive_mode = self._host_cfg[host_id, 'passive_mode']
         encrypt_data = self._host_cfg[host_id, 'encrypt_data']
         tls = self._tls
+        # ftputil creates more sessions for transferring files;
+        # only the first one is timed
+        timed = [cstats]
         try:
             class SessFac(ftplib.FTP_TLS if tls else ftplib.FTP):
                 def __init__(self):
                     super().__init__()
-                    self.connect(host, port, timeout)
+                    cs = timed.pop() if timed else None
+                    mark = cs.mark if cs else (lambda phase: None)
+                    addrinfos = utils.resolve(host, port)
+                    mark('dns')
+                    self._connect_addr(addrinfos)
+                    mark('connect')
+                    if tls:
+                        self.auth()
+                        mark('tls')
                     self.login(user, passwd)
+                    mark('login')
                     self.set_pasv(passive_mode)
                     if tls and encrypt_data:
                         self.prot_p()
 
+                def _connect_addr(self, addrinfos):
+                    err = None
+                    for addrinfo in addrinfos:
+                        try:
+                            self.connect(addrinfo[4][0], port, timeout)
+                            # for the server name indication (TLS)
+                            self.host = host
+                            return
+                        except OSError as ex:
+                            err = ex
+                    raise err or OSError('no address to connect to')
+
             ftp_host = ftputil.FTPHost(session_factory=SessFac)
             ftp_host.use_list_a_option = self._host_cfg[host_id, 'dir_a_option']
             if self._host_cfg[host_id, 'keep_alive']:
@@ -60,14 +89,64 @@ class _Ftp:
                                  args=(ftp_host,
                                        self._host_cfg[host_id, 'keep_alive']),
                                  daemon=True).start()
+            cstats.mark('setup')
             return ftp_host
         except (OSError, ftputil.error.FTPError) as ex:
             raise ConnectError(f'Connection to server "{host}:{port}"'
                                f' failed: {ex}')
 
-    def _close(self):
+    def _pool_key(self):
+        host_id = self._host_cfg['host_id']
+        return (('FTPS' if self._tls else 'FTP',) +
+                self._host_cfg[host_id, 'host'] +
+                tuple(self._host_cfg[host_id, opt]
+                      for opt in ('user', 'password', 'passive_mode',
+                                  'encrypt_data', 'dir_a_option')))
+
+    @staticmethod
+    def _check_conn(conn):
+        conn.keep_alive()
+        conn.stat_cache.clear()
+        return True
+
+    @staticmethod
+    def _disconnect(conn):
         with suppress(Exception):
-            self._conn.close()
+            conn.close()
+
+    def connected(self, conn=None):
+        try:
+            return self._check_conn(self._conn if conn is None else conn)
+        except Exception:
+            return False
+
+    def _worker_conn(self):
+        return self._acquire(self._pool_key(), self._connect,
+                             self._check_conn)
+
+    def _release_conn(self, conn):
+        connpool.release(self._pool_key(), conn, self._disconnect)
+
+    def is_transient(self, exc):
+        # 4xx replies are transient, 5xx replies permanent
+        if isinstance(exc, ftplib.error_temp):
+            return True
+        if isinstance(exc, ftplib.error_perm):
+            return False
+        code = getattr(exc, 'errno', None)
+        if (isinstance(exc, ftputil.error.FTPError) and
+                isinstance(code, int) and 400 <= code < 600):
+            return code < 500
+        return super().is_transient(exc)
+
+    def _reconnect(self):
+        self._disconnect(self._conn)
+        self._conn = self._acquire(self._pool_key(), self._connect,
+                                   self._check_conn)
+        self._bind()
+
+    def _close(self):
+        connpool.release(self._pool_key(), self._conn, self._disconnect)
 
 
 class FTPSource(_Ftp, BaseSource):
@@ -80,6 +159,28 @@ class FTPSource(_Ftp, BaseSource):
 
     def __init__(self, job_cfg, tls=False):
         super().__init__(job_cfg, job_cfg['source_host_cfg'], tls)
+
+    def _scandir(self, path, conn=None):
+        # the stat cache of ftputil is filled by listdir()
+        conn = self._conn if conn is None else conn
+        entries = []
+        for name in conn.listdir(path):
+            p = conn.path.join(path, name)
+            is_dir = conn.path.isdir(p)
+            is_file = not is_dir and conn.path.isfile(p)
+            size = mtime = None
+            if self._stat_entries and (is_dir or is_file):
+                st = conn.stat(p)
+                size, mtime = st.st_size, st.st_mtime
+            entries.append((name, is_dir, is_file, size, mtime))
+        return entries
+
+    def _mtime(self, path, conn=None):
+        conn = self._conn if conn is None else conn
+        return conn.stat(path).st_mtime
+
+    def _bind(self):
+        super()._bind()
         self._listdir = self._conn.listdir
         self._isdir = self._conn.path.isdir
         self._isfile = self._conn.path.isfile
@@ -95,6 +196,9 @@ class FTPTarget(_Ftp, BaseTarget):
 
     def __init__(self, job_cfg, tls=False):
         super().__init__(job_cfg, job_cfg['target_host_cfg'], tls)
+
+    def _bind(self):
+        super()._bind()
         self._path_base = self._conn.path.basename
         self._path_dir = self._conn.path.dirname
         self._path_exists = self._conn.path.exists
@@ -0,0 +1,83 @@
+"""Event hooks."""
+
+
+class TransferHooks:
+    """Base class for event hooks.
+
+    Subclasses override the methods for the events they are interested in;
+    the default implementations do nothing. The methods are called from
+    the thread that runs the transfer and should return quickly. They must
+    not raise exceptions; use :meth:`cancel` to stop a transfer.
+
+    Paths are relative to the source/target base path except for the
+    listing events where they are full source paths.
+
+    .. versionadded:: 0.12.0
+    """
+
+    #: Minimum interval in seconds between two :meth:`file_progress`
+    #: events for the same file.
+    progress_interval = 0.5
+
+    _cancelled = False
+
+    def listing_started(self, path):
+        """Called before a source directory is listed."""
+
+    def listing_finished(self, path, count):
+        """Called after a source directory was listed.
+
+        :param str path: the directory
+        :param int count: number of entries
+        """
+
+    def file_started(self, path):
+        """Called before a file is transferred."""
+
+    def file_progress(self, path, bytes_done):
+        """Called while a file is transferred (rate-limited).
+
+        :param str path: the file
+        :param int bytes_done: number of bytes transferred so far
+        """
+
+    def file_done(self, path, stats):
+        """Called after a file was transferred.
+
+        :param str path: the file
+        :param stats: the file statistics
+        :type stats: filetransfer.FileStats
+        """
+
+    def file_failed(self, path, exc, source):
+        """Called if a file could not be transferred.
+
+        :param str path: the file
+        :param Exception exc: the error
+        :param bool source: ``True`` for a source error,
+                            ``False`` for a target error
+        """
+
+    def retry_scheduled(self, attempt, delay, exc):
+        """Called before a job is retried and before a file that failed
+        with a transient error is transferred again (job option
+        ``file_retries``; :meth:`file_started` is not called again).
+
+        :param int attempt: number of the next attempt (starting with 1)
+        :param float delay: seconds until the retry
+        :param Exception exc: the error that caused the retry
+        """
+
+    def cancel(self):
+        """Cancel the transfer.
+
+        The transfer stops before the next file or the next chunk of the
+        current file (which will be removed) and
+        :exc:`~filetransfer.Terminated` is raised.
+        """
+        self._cancelled = True
+
+    @property
+    def cancelled(self):
+        """Return ``True`` if :meth:`cancel` was called."""
+        return self._cancelled
@@ -1,24 +1,27 @@
 """Job module."""
 
+import itertools
 import logging
 import os
+import threading
 import time
-from contextlib import nullcontext, suppress
+from contextlib import closing, contextmanager, nullcontext, suppress
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from salmagundi.utils import ensure_single_instance, AlreadyRunning
 
+from . import utils
 from .const import ExitCodes, FileTags
 from .exceptions import (ConnectError, TransferError, SingleInstanceError,
                          NotReadyError, Terminated, Error)
-from .local import LocalSource, LocalTarget
-from .ftp import FTPSource, FTPTarget
-from .sftp import SFTPSource, SFTPTarget
+from .manifest import VerificationError
+from .records import FileRecords, RecordView, error_message
+from .stats import FileStats, TransferStats
 
-_RETRY_MAX_INTERVAL = 60.0  # seconds
-_RETRY_BACKOFF_FACTOR = 1.0
-_RETRY_BACKOFF_BASE = 2.0
+
+_instance_locks = {}  # single_instance name -> threading.Lock
+_instance_locks_lock = threading.Lock()
 
 _logger = logging.getLogger(__name__)
 
@@ -30,7 +33,24 @@ class JobResult:
     files_cnt: int
     src_error_cnt: int
     tgt_error_cnt: int
-    file_list: list = field(repr=False)
+    file_list: RecordView = field(repr=False)
+    bytes_cnt: int = 0
+    transfer_time: float = 0.0
+    list_time: float = 0.0
+    file_stats: RecordView = field(default=None, repr=False)
+    connect_stats: tuple = field(default=(), repr=False)
+
+    @property
+    def connect_time(self):
+        """Return the total time for connecting to the servers."""
+        return sum(cstats.total for cstats in self.connect_stats)
+
+    @property
+    def bytes_per_sec(self):
+        """Return the aggregate transfer rate."""
+        if self.transfer_time > 0:
+            return self.bytes_cnt / self.transfer_time
+        return 0.0
 
     def __str__(self):
         return (f'{self.files_cnt} file(s) transferred, '
@@ -38,7 +58,7 @@ class JobResult:
                 f'{self.tgt_error_cnt} target error(s)')
 
 
-def run(app_cfg, job_cfg, exc=None):
+def run(app_cfg, job_cfg, exc=None, hooks=None):
     """Run a job.
 
     :param app_cfg: the application configuration
@@ -46,6 +66,8 @@ def run(app_cfg, job_cfg, exc=None):
     :param job_cfg: the job configuration
     :type job_cfg: easimpconf.Config
     :param Exception exc: Exception to be reraised
+    :param hooks: event hooks
+    :type hooks: filetransfer.hooks.TransferHooks
     :returns: job result and exit code (0: success, 1: with errors)
     :rtype: JobResult, bool
     :raises filetransfer.ConnectError: if there is a connection problem
@@ -55,21 +77,40 @@ def run(app_cfg, job_cfg, exc=None):
                                               is violated
     :raises filetransfer.Terminated: if terminatated
     :raises Exception: if parameter ``exc`` is set
+
+    If profiling is enabled in the application configuration the job
+    runs under the profiler (see: :mod:`filetransfer.profiler`).
     """
+    if app_cfg['profile', 'enabled']:
+        from . import profiler
+        return profiler.run(app_cfg, job_cfg, _run,
+                            app_cfg, job_cfg, exc, hooks)
+    return _run(app_cfg, job_cfg, exc, hooks)
+
+
+def _run(app_cfg, job_cfg, exc, hooks):
     ready_file = _check_ready_file(job_cfg)
     ctx = _create_context(app_cfg, job_cfg)
-    collect_data = job_cfg['job', 'collect_data']
-    files, exit_code, result = {}, None, None
+    files = FileRecords(job_cfg['job', 'collect_data'])
+    exit_code, result = None, None
+    tstats = TransferStats()
     try:
         with ctx:
             app_cfg['log_handler'].activate()
             if exc and isinstance(exc, BaseException):
                 raise exc
             for i in range(1 + job_cfg['job', 'retries']):
+                tstats.retries = i
                 try:
-                    transfer(job_cfg, files)
-                    result = create_result(files, collect_data)
+                    transfer(job_cfg, files, tstats, hooks)
+                    result = create_result(files, tstats)
                     _logger.info('Transfer completed: %s', result)
+                    _logger.info('Transfer statistics: %d bytes in %.3fs'
+                                 ' (%.0f bytes/s); listing: %.3fs;'
+                                 ' connecting: %.3fs',
+                                 result.bytes_cnt, result.transfer_time,
+                                 result.bytes_per_sec, result.list_time,
+                                 result.connect_time)
                     if result.src_error_cnt or result.tgt_error_cnt:
                         exit_code = ExitCodes.ERRORS
                     else:
@@ -79,35 +120,42 @@ def run(app_cfg, job_cfg, exc=None):
                 except Error as ex:
                     if i == job_cfg['job', 'retries']:
                         raise
-                    t = min(_RETRY_MAX_INTERVAL,
-                            _RETRY_BACKOFF_FACTOR * _RETRY_BACKOFF_BASE ** i)
+                    t = utils.retry_delay(i)
                     _logger.error('Error: %s; retry in %.1f seconds', ex, t)
+                    if hooks is not None:
+                        hooks.retry_scheduled(i + 1, t, ex)
                     time.sleep(t)
+                    if hooks is not None and hooks.cancelled:
+                        raise Terminated('cancelled')
     except AlreadyRunning as ex:
         raise SingleInstanceError(ex) from None
     except KeyboardInterrupt as ex:
         _log_critical('KeyboardInterrupt', ex)
         exit_code = ExitCodes.TERMINATED
         result = _add_result(Terminated('KeyboardInterrupt'),
-                             files, collect_data)
+                             files, tstats)
         raise result
     except Terminated as ex:
         _log_critical('Terminated', ex)
         exit_code = ExitCodes.TERMINATED
-        result = _add_result(ex, files, collect_data)
+        result = _add_result(ex, files, tstats)
         raise result
     except (ConnectError, TransferError) as ex:
         _log_critical(ex.__class__.__name__, ex)
         exit_code = ExitCodes.FAILURE
-        result = _add_result(ex, files, collect_data)
+        result = _add_result(ex, files, tstats)
         raise result
     except Exception as ex:
         _log_critical('Error', ex)
-        result = _add_result(ex, files, collect_data)
+        result = _add_result(ex, files, tstats)
         raise result
     finally:
         if result is not None:
             end_time = datetime.now()
+            if app_cfg['metrics', 'textfile_dir']:
+                from . import metrics
+                metrics.write_textfile(app_cfg, job_cfg, end_time,
+                                       exit_code, result, tstats)
             if app_cfg['mail_config_ok']:
                 from . import mail
                 mail.send(app_cfg, job_cfg, end_time, exit_code, result)
@@ -117,8 +165,8 @@ def run(app_cfg, job_cfg, exc=None):
                          exit_code.code if exit_code else None)
 
 
-def _add_result(ex, files, collect_data):
-    ex.result = create_result(files, collect_data)
+def _add_result(ex, files, tstats):
+    ex.result = create_result(files, tstats)
     return ex
 
 
@@ -127,17 +175,23 @@ def _log_critical(msg, exc):
     _logger.debug(msg, exc_info=exc)
 
 
+# protocol modules are imported when needed because
+# importing ftputil and paramiko takes quite some time
 def _create_source(job_cfg):
     host_id = job_cfg['source', 'host_id']
     if host_id:
         src_type = job_cfg['source_host_cfg'][host_id, 'type']
         if src_type == 'FTP':
+            from .ftp import FTPSource
             return FTPSource(job_cfg)
         elif src_type == 'FTPS':
+            from .ftp import FTPSource
             return FTPSource(job_cfg, True)
         elif src_type == 'SFTP':
+            from .sftp import SFTPSource
             return SFTPSource(job_cfg)
     else:
+        from .local import LocalSource
         return LocalSource(job_cfg)
 
 
@@ -146,80 +200,250 @@ def _create_target(job_cfg):
     if host_id:
         tgt_type = job_cfg['target_host_cfg'][host_id, 'type']
         if tgt_type == 'FTP':
+            from .ftp import FTPTarget
             return FTPTarget(job_cfg)
         elif tgt_type == 'FTPS':
+            from .ftp import FTPTarget
             return FTPTarget(job_cfg, True)
         elif tgt_type == 'SFTP':
+            from .sftp import SFTPTarget
             return SFTPTarget(job_cfg)
     else:
+        from .local import LocalTarget
         return LocalTarget(job_cfg)
 
 
-def transfer(job_cfg, files):
+def transfer(job_cfg, files, tstats=None, hooks=None):
     """Transfer files.
 
-    ``files``: path -> duration|(True|False, exc) -- True: src, False: tgt
+    Files that were already transferred (in a previous attempt) are skipped.
 
     :param job_cfg: the job configuration
     :type job_cfg: easimpconf.Config
-    :param dict files: files
-    :return: job result
-    :rtype: JobResult
+    :param files: records of the files
+    :type files: filetransfer.records.FileRecords
+    :param tstats: statistics that are not related to a single file
+    :type tstats: filetransfer.stats.TransferStats
+    :param hooks: event hooks
+    :type hooks: filetransfer.hooks.TransferHooks
     :raises filetransfer.ConnectError: if there is a connection problem
     :raises filetransfer.TransferError: if there is a fatal problem
                                         during transfer
+    :raises filetransfer.Terminated: if the transfer was cancelled
     """
+    for file_path, value in iter_transfer(job_cfg, files.transferred,
+                                          tstats, hooks):
+        files.add(file_path, value)
+
+
+def iter_transfer(job_cfg, skip=None, tstats=None, hooks=None):
+    """Transfer files and yield the outcome for each file.
+
+    The outcome is a tuple (path, FileStats|(True|False, exc)) -- True: src,
+    False: tgt. The connections are closed when the generator is closed.
+
+    Files that failed with a transient error are transferred again after
+    all other files (up to ``file_retries`` times; with backoff).
+
+    :param job_cfg: the job configuration
+    :type job_cfg: easimpconf.Config
+    :param skip: function that returns ``True`` for paths that must
+                 not be transferred
+    :param tstats: statistics that are not related to a single file
+    :type tstats: filetransfer.stats.TransferStats
+    :param hooks: event hooks
+    :type hooks: filetransfer.hooks.TransferHooks
+    :raises filetransfer.ConnectError: if there is a connection problem
+    :raises filetransfer.TransferError: if there is a fatal problem
+                                        during transfer
+    :raises filetransfer.Terminated: if the transfer was cancelled
+    """
+    with closing(steps(job_cfg, skip, tstats, hooks)) as it:
+        for item in it:
+            if item is None:
+                continue
+            if isinstance(item, float):
+                time.sleep(item)
+                continue
+            yield item
+
+
+def steps(job_cfg, skip=None, tstats=None, hooks=None):
+    """Transfer files in steps.
+
+    Like :func:`iter_transfer` but the generator also yields ``None``
+    after each chunk of a file and a :class:`float` (seconds) where the
+    caller must wait before the next step. Each step only blocks for a
+    short time (connecting, listing a directory, opening a file or
+    transferring a chunk), so the steps of many transfers can be
+    interleaved (see: :mod:`filetransfer.aio`).
+
+    .. versionadded:: 0.12.0
+    """
+    file_retries = job_cfg['job', 'file_retries']
     with _create_source(job_cfg) as src, _create_target(job_cfg) as tgt:
+        src.hooks = tgt.hooks = hooks
+        pending = []
         try:
             for file_path, obj in src.files():
                 try:
-                    if (isinstance(files.get(file_path), timedelta) or
+                    if ((skip is not None and skip(file_path)) or
                             file_path == job_cfg['job', 'ready_file']):
                         continue
                     if isinstance(obj, Exception):
-                        files[file_path] = (True, obj)
-                        continue
-                    start_time = datetime.now()
-                    exc = tgt.store(file_path, obj)
-                    if exc is None:
-                        duration = datetime.now() - start_time
-                        files[file_path] = duration
-                        _logger.info('Transferred - file: %s (%s)',
-                                     file_path, duration)
+                        stats, exc, is_src = None, obj, True
                     else:
-                        files[file_path] = (False, exc)
+                        if hooks is not None:
+                            if hooks.cancelled:
+                                raise Terminated('cancelled')
+                            hooks.file_started(file_path)
+                        stats, exc, is_src = yield from _store(
+                            src, tgt, file_path, obj)
+                    if (file_retries and exc is not None and
+                            _is_transient(src, tgt, file_path, exc, is_src)):
+                        _logger.warning('Retry later - file: %s (%s)',
+                                        file_path, exc)
+                        pending.append((file_path, exc))
+                        continue
+                    yield _outcome(src, file_path, stats, exc, is_src, hooks)
                 finally:
                     with suppress(Exception):
                         obj.close()
+            for attempt in range(file_retries):
+                if not pending:
+                    break
+                t = utils.retry_delay(attempt)
+                _logger.info('Retry %d file(s) in %.1f seconds',
+                             len(pending), t)
+                if hooks is not None:
+                    for _, exc in pending:
+                        hooks.retry_scheduled(attempt + 1, t, exc)
+                yield t
+                last = attempt + 1 == file_retries
+                failed, pending = pending, []
+                for file_path, _ in failed:
+                    if hooks is not None and hooks.cancelled:
+                        raise Terminated('cancelled')
+                    try:
+                        reader = src.open(file_path)
+                    except ConnectError:
+                        raise
+                    except Exception as ex:
+                        _logger.error('Source: %s (%s)', file_path, ex)
+                        stats, exc, is_src = None, ex, True
+                    else:
+                        try:
+                            stats, exc, is_src = yield from _store(
+                                src, tgt, file_path, reader)
+                        finally:
+                            with suppress(Exception):
+                                reader.close()
+                    if (not last and exc is not None and
+                            _is_transient(src, tgt, file_path, exc, is_src)):
+                        pending.append((file_path, exc))
+                        continue
+                    yield _outcome(src, file_path, stats, exc, is_src, hooks)
+        except ConnectError:
+            raise
         except Exception as ex:
             raise TransferError(ex)
+        finally:
+            if tstats is not None:
+                tstats.list_time += src.list_time
+                tstats.connect_time += src.connect_time + tgt.connect_time
+                tstats.connects.extend(src.connect_stats)
+                tstats.connects.extend(tgt.connect_stats)
+
+
+def _is_transient(src, tgt, path, exc, is_src):
+    if is_src:
+        return path not in src.failed_dirs and src.is_transient(exc)
+    # errors of the source (while reading) are returned by the target
+    return tgt.is_transient(exc) or src.is_transient(exc)
+
+
+def _outcome(src, path, stats, exc, is_src, hooks):
+    """Return the outcome for a file (see: :func:`iter_transfer`)."""
+    if exc is not None:
+        if hooks is not None:
+            hooks.file_failed(path, exc, is_src)
+        return path, (is_src, exc)
+    _logger.info('Transferred - file: %s (%s; %d bytes; %.0f bytes/s;'
+                 ' open=%.3fs ttfb=%.3fs rename=%.3fs)',
+                 path, stats.duration, stats.size, stats.bytes_per_sec,
+                 stats.open_time, stats.ttfb, stats.rename_time)
+    src.transferred(path)
+    if hooks is not None:
+        hooks.file_done(path, stats)
+    return path, stats
+
+
+def _store(src, tgt, path, reader):
+    """Store a file; it is transferred again if a lost connection
+    could be re-established.
+
+    This is a generator (see: :func:`steps`).
+
+    :return: tuple (stats, exc, True if exc is a source error)
+    """
+    opened = None
+    try:
+        for attempt in itertools.count():
+            stats = FileStats()
+            stats.open_time = src.open_time
+            start_time = datetime.now()
+            exc = yield from tgt.store_steps(path, reader, stats)
+            if exc is None:
+                stats.duration = datetime.now() - start_time
+                return stats, None, False
+            if isinstance(exc, VerificationError):
+                return stats, exc, True
+            recovered = src.recover(attempt, exc)
+            if not (tgt.recover(attempt, exc) or recovered):
+                return stats, exc, False
+            _logger.info('Retry - file: %s', path)
+            with suppress(Exception):
+                reader.close()
+            try:
+                reader = opened = src.open(path)
+            except ConnectError:
+                raise
+            except Exception as ex:
+                _logger.error('Source: %s (%s)', path, ex)
+                return stats, ex, True
+    finally:
+        if opened is not None:
+            with suppress(Exception):
+                opened.close()
+
 
+def file_entry(path, value):
+    """Return a ``file_list`` entry (path, info, tag) for a file outcome."""
+    if isinstance(value, tuple):
+        tag = FileTags.SRCERR if value[0] else FileTags.TGTERR
+        return path, error_message(value[1]), tag
+    return path, value.duration, FileTags.TRANSF
 
-def create_result(files, collect_data):
-    """Create job result."""
-    transf_cnt, srcerr_cnt, tgterr_cnt = 0, 0, 0
-    if collect_data:
-        file_lst = []
+
+def create_result(files, tstats=None):
+    """Create job result.
+
+    :param files: records of the files
+    :type files: filetransfer.records.FileRecords
+    :param tstats: statistics that are not related to a single file
+    :type tstats: filetransfer.stats.TransferStats
+    """
+    if files.collect_data:
+        file_lst = RecordView(files.entries, len(files))
+        file_stats = RecordView(files.stats, files.files_cnt)
     else:
         file_lst = None
-    for path, value in files.items():
-        if isinstance(value, tuple):
-            if value[0]:
-                srcerr_cnt += 1
-                tag = FileTags.SRCERR
-            else:
-                tgterr_cnt += 1
-                tag = FileTags.TGTERR
-            info = str(value[1]).split('\n')[0]
-        else:
-            transf_cnt += 1
-            info = value
-            tag = FileTags.TRANSF
-        if file_lst is not None:
-            file_lst.append((path, info, tag))
-    if file_lst:
-        file_lst.sort()
-    return JobResult(transf_cnt, srcerr_cnt, tgterr_cnt, file_lst)
+        file_stats = None
+    return JobResult(files.files_cnt, files.src_error_cnt,
+                     files.tgt_error_cnt, file_lst,
+                     files.bytes_cnt, files.transfer_time,
+                     tstats.list_time if tstats else 0.0, file_stats,
+                     tuple(tstats.connects) if tstats else ())
 
 
 def _check_ready_file(job_cfg):
@@ -247,10 +471,24 @@ def _create_context(app_cfg, job_cfg):
         else:
             name = job_cfg['job', 'single_instance']
         msg = f'already running: job {job_cfg["job_id"]} (lock: {name})'
-        ctx = ensure_single_instance(name,
-                                     lockdir=app_cfg['global', 'locks_dir'],
-                                     err_code=None,
-                                     err_msg=msg)
+        ctx = _single_instance(name, app_cfg['global', 'locks_dir'], msg)
     else:
         ctx = nullcontext()
     return ctx
+
+
+@contextmanager
+def _single_instance(name, lockdir, msg):
+    # the lock file is locked with fcntl, which only locks between
+    # processes; jobs running in threads of one process (runner, daemon)
+    # are excluded by a thread lock per name
+    with _instance_locks_lock:
+        lock = _instance_locks.setdefault(name, threading.Lock())
+    if not lock.acquire(blocking=False):
+        raise AlreadyRunning(msg)
+    try:
+        with ensure_single_instance(name, lockdir=lockdir, err_code=None,
+                                    err_msg=msg):
+            yield
+    finally:
+        lock.release()
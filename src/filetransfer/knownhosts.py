@@ -0,0 +1,264 @@
+"""Indexed SSH ``known_hosts`` files.
+
+:class:`paramiko.HostKeys` parses every key in a ``known_hosts`` file
+and looks up a host with a linear scan that re-hashes all hashed entries.
+:class:`KnownHosts` only splits the lines and indexes them: plain host
+names in a :class:`dict` and hashed entries by salt and HMAC. The keys
+are compared as strings, so no key has to be parsed.
+
+For hashed entries the hostname must be hashed once for every distinct
+salt; the result of a lookup is memoized, so that repeated lookups of
+a host are a single :class:`dict` access. With a cache directory the
+memo is also stored on disk (keyed by the path, modification time and
+size of the file), so that a new process does not even read the file
+for a host that was looked up before.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+
+from .utils import replace_file
+
+_HASH_MAGIC = '|1|'
+
+_cache = {}  # path -> (mtime_ns, size, KnownHosts)
+_cache_lock = threading.Lock()
+
+_logger = logging.getLogger(__name__)
+
+
+class KnownHosts:
+    """Index of a ``known_hosts`` file.
+
+    :param str text: content of the file
+    """
+
+    def __init__(self, text=''):
+        self._text = text
+        self._path = None  # read the text from this file if text is None
+        self._lines = None
+        self._plain = {}  # hostname -> [(lineno, keytype, key), ...]
+        self._hashed = {}  # salt -> {hmac: [(lineno, keytype, key), ...]}
+        self._memo = {}
+        self._memo_file = None  # (path, cache key)
+        self._lock = threading.Lock()
+
+    def _index(self):
+        # the file is indexed when it is needed for the first time
+        if self._lines is not None:
+            return
+        if self._text is None:
+            with open(self._path) as fh:
+                self._text = fh.read()
+            st = os.stat(self._path)
+            if self._memo_file and self._memo_file[1] != _cache_key(
+                    self._path, st):
+                # the file changed after the memo was loaded
+                self._memo.clear()
+                self._memo_file = None
+        self._lines = self._text.splitlines()
+        self._text = None
+        for lineno, line in enumerate(self._lines):
+            self._index_line(lineno, line)
+
+    def _index_line(self, lineno, line):
+        line = line.strip()
+        if not line or line[0] in '#@':
+            return
+        fields = line.split()
+        if len(fields) < 3:
+            return
+        names, keytype, key = fields[:3]
+        entry = (lineno, keytype, key)
+        for name in names.split(','):
+            if name.startswith(_HASH_MAGIC):
+                try:
+                    salt, digest = name[len(_HASH_MAGIC):].split('|', 1)
+                    salt = base64.b64decode(salt)
+                    digest = base64.b64decode(digest)
+                except (ValueError, binascii.Error):
+                    continue
+                (self._hashed.setdefault(salt, {})
+                 .setdefault(digest, []).append(entry))
+            else:
+                self._plain.setdefault(name, []).append(entry)
+
+    @classmethod
+    def load(cls, path, cache_dir=None):
+        """Return the index for the file ``path``.
+
+        The index is cached and rebuilt when the modification time or
+        the size of the file changes. It is shared, so it must not be
+        modified; use :meth:`read` for that.
+
+        .. versionchanged:: 0.12.0 parameter ``cache_dir``
+
+        :param path: path to the ``known_hosts`` file
+        :type path: :term:`path-like object`
+        :param cache_dir: directory for storing the results of lookups
+        :type cache_dir: :term:`path-like object`
+        :rtype: KnownHosts
+        :raises OSError: if the file cannot be read
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        key = _cache_key(path, st)
+        with _cache_lock:
+            cached = _cache.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        known_hosts = cls(None)
+        known_hosts._path = path
+        if cache_dir:
+            known_hosts._load_memo(cache_dir, key)
+        else:
+            known_hosts._index()
+        with _cache_lock:
+            _cache[path] = (key, known_hosts)
+        return known_hosts
+
+    @classmethod
+    def read(cls, path):
+        """Return a new index for the file ``path`` that may be modified.
+
+        .. versionadded:: 0.12.0
+
+        :param path: path to the ``known_hosts`` file
+        :type path: :term:`path-like object`
+        :rtype: KnownHosts
+        :raises OSError: if the file cannot be read
+        """
+        with open(path) as fh:
+            return cls(fh.read())
+
+    def _load_memo(self, cache_dir, key):
+        name = hashlib.sha1(key[0].encode()).hexdigest()[:16]
+        path = os.path.join(cache_dir, f'knownhosts-{name}.json')
+        self._memo_file = (path, key)
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+            if data['key'] == key:
+                self._memo = {host: [tuple(e) for e in entries]
+                              for host, entries in data['memo'].items()}
+                _logger.debug('known_hosts memo loaded from %s', path)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def _save_memo(self):
+        path, key = self._memo_file
+        data = json.dumps({'key': key, 'memo': self._memo})
+        try:
+            replace_file(path, data.encode())
+        except OSError as ex:
+            _logger.debug('known_hosts memo not saved: %s', ex)
+
+    def _entries(self, hostname):
+        entries = self._memo.get(hostname)
+        if entries is None:
+            with self._lock:
+                self._index()
+                entries = list(self._plain.get(hostname, ()))
+                name = hostname.encode()
+                for salt, digests in self._hashed.items():
+                    digest = hmac.new(salt, name, hashlib.sha1).digest()
+                    entries.extend(digests.get(digest, ()))
+                entries.sort()
+                self._memo[hostname] = entries
+                if self._memo_file:
+                    self._save_memo()
+        return entries
+
+    def lookup(self, hostname):
+        """Return the keys for ``hostname``.
+
+        :param str hostname: hostname like ``example.com`` or
+                             ``[example.com]:2222``
+        :return: list of tuples (key type, base64 encoded key)
+        :rtype: list
+        """
+        return [entry[1:] for entry in self._entries(hostname)]
+
+    def check(self, hostname, key):
+        """Check the hostkey of a server.
+
+        :param str hostname: hostname like ``example.com`` or
+                             ``[example.com]:2222``
+        :param key: the key of the server
+        :type key: paramiko.PKey
+        :return: ``True`` if the key is known for the host
+        :rtype: bool
+        """
+        keytype = key.get_name()
+        entries = [e for e in self._entries(hostname) if e[1] == keytype]
+        if not entries:
+            return False
+        key = key.get_base64()
+        return any(e[2] == key for e in entries)
+
+    def add(self, hostname, key, hash_=False):
+        """Add a key.
+
+        :param str hostname: hostname like ``example.com`` or
+                             ``[example.com]:2222``
+        :param key: the key
+        :type key: paramiko.PKey
+        :param bool hash_: if ``True`` the hostname will be hashed
+        """
+        if hash_:
+            hostname = hash_host(hostname)
+        line = f'{hostname} {key.get_name()} {key.get_base64()}'
+        self._index()
+        self._lines.append(line)
+        self._index_line(len(self._lines) - 1, line)
+        self._memo.clear()
+        self._memo_file = None
+
+    def remove(self, hostname):
+        """Remove all lines with keys for ``hostname``.
+
+        :param str hostname: hostname like ``example.com`` or
+                             ``[example.com]:2222``
+        :return: ``True`` if lines were removed
+        :rtype: bool
+        """
+        linenos = {e[0] for e in self._entries(hostname)}
+        if not linenos:
+            return False
+        text = '\n'.join(line for i, line in enumerate(self._lines)
+                         if i not in linenos)
+        self.__init__(text)
+        return True
+
+    def save(self, path):
+        """Write the file.
+
+        :param path: path to the ``known_hosts`` file
+        :type path: :term:`path-like object`
+        """
+        self._index()
+        with open(path, 'w') as fh:
+            for line in self._lines:
+                fh.write(line + '\n')
+
+
+def _cache_key(path, st):
+    return [path, st.st_mtime_ns, st.st_size]
+
+
+def hash_host(hostname):
+    """Return a hashed hostname as written by OpenSSH.
+
+    :param str hostname: the hostname
+    :rtype: str
+    """
+    salt = os.urandom(hashlib.sha1().digest_size)
+    digest = hmac.new(salt, hostname.encode(), hashlib.sha1).digest()
+    return (f'{_HASH_MAGIC}{base64.b64encode(salt).decode()}'
+            f'|{base64.b64encode(digest).decode()}')
@@ -2,6 +2,7 @@
 
 import logging
 import os
+from contextlib import suppress
 from functools import partial
 
 from .base import BaseSource, BaseTarget
@@ -33,6 +34,22 @@ class LocalSource(_Local, BaseSource):
         self._isdir = os.path.isdir
         self._isfile = os.path.isfile
 
+    def _scandir(self, path, conn=None):
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                size = mtime = None
+                if self._stat_entries:
+                    with suppress(OSError):
+                        st = entry.stat()
+                        size, mtime = st.st_size, st.st_mtime
+                entries.append((entry.name, entry.is_dir(), entry.is_file(),
+                                size, mtime))
+        return entries
+
+    def _mtime(self, path, conn=None):
+        return os.stat(path).st_mtime
+
 
 class LocalTarget(_Local, BaseTarget):
     """Target implementation for local filesystem.
@@ -1,27 +1,103 @@
 """Log handler."""
 
 import logging
+import queue
 import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+_BUFFER_SIZE = 10000  # records kept before activation
+_FLUSH_TIMEOUT = 10.0  # seconds
+_STOP = object()
 
 
 class LogHandler(logging.Handler):
-    """Log handler class."""
+    """Log handler class.
+
+    Records are buffered until the handler is activated. The buffer holds
+    at most ``buffer_size`` records; if it is full the oldest records are
+    discarded.
+
+    If ``buffered`` is ``True`` the formatted records are written by
+    a background thread in batches. The output is flushed every
+    ``flush_interval`` seconds and immediately after records with
+    level ``WARNING`` or higher.
+
+    :param filename: log file; if ``None`` records are written to ``stderr``
+    :param bool buffered: if ``True`` a background thread writes the records
+    :param float flush_interval: seconds between two flushes
+    :param int buffer_size: size of the buffer used before activation
+    """
 
     terminator = '\n'
 
-    def __init__(self, filename):
+    def __init__(self, filename, buffered=False, flush_interval=1.0,
+                 buffer_size=_BUFFER_SIZE):
         super().__init__()
         self._filename = filename
         self._activated = False
         self._enabled = True
         self._out = None
-        self._buffer = []
+        self._buffer = deque(maxlen=buffer_size)
+        self._discarded = 0
+        self._buffered = buffered
+        self._flush_interval = flush_interval
+        self._queue = None
+        self._writer = None
 
     def _open(self):
         if self._filename:
             self._out = open(self._filename, 'w')
         else:
             self._out = sys.stderr
+        if self._buffered:
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._write_loop,
+                                            name='LogHandler-writer',
+                                            daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        pending = False
+        last_flush = time.monotonic()
+        stop = False
+        while not stop:
+            try:
+                items = [self._queue.get(
+                    timeout=self._flush_interval if pending else None)]
+            except queue.Empty:
+                items = []
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            texts, events, flush = [], [], not items
+            for item in items:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    events.append(item)
+                else:
+                    texts.append(item[0])
+                    flush = flush or item[1]
+            try:
+                if texts:
+                    self._out.write(''.join(texts))
+                    pending = True
+                now = time.monotonic()
+                if pending and (flush or stop or events or
+                                now - last_flush >= self._flush_interval):
+                    self._out.flush()
+                    pending = False
+                    last_flush = now
+            except Exception:
+                if logging.raiseExceptions:
+                    traceback.print_exc(file=sys.stderr)
+            for event in events:
+                event.set()
 
     def emit(self, record):
         """Overwrite ``emit``."""
@@ -29,11 +105,17 @@ class LogHandler(logging.Handler):
             return
         if self._activated:
             try:
-                self._out.write(self.format(record) + self.terminator)
-                self._out.flush()
+                msg = self.format(record) + self.terminator
+                if self._queue is not None:
+                    self._queue.put((msg, record.levelno >= logging.WARNING))
+                else:
+                    self._out.write(msg)
+                    self._out.flush()
             except Exception:
                 self.handleError(record)
         else:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._discarded += 1
             self._buffer.append(record)
 
     def handle(self, record):
@@ -42,11 +124,30 @@ class LogHandler(logging.Handler):
             return
         super().handle(record)
 
+    def flush(self):
+        """Overwrite ``flush``.
+
+        In buffered mode this waits until the background thread has
+        written and flushed all records emitted before.
+        """
+        writer = self._writer
+        if writer is not None and writer.is_alive():
+            event = threading.Event()
+            self._queue.put(event)
+            event.wait(_FLUSH_TIMEOUT)
+        elif self._out is not None and not self._out.closed:
+            self._out.flush()
+
     def close(self):
         """Overwrite ``close``."""
         self.acquire()
         try:
             try:
+                if self._writer is not None:
+                    self._queue.put(_STOP)
+                    self._writer.join()
+                    self._writer = None
+                    self._queue = None
                 if self._filename and self._out:
                     self._out.close()
             finally:
@@ -72,6 +173,12 @@ class LogHandler(logging.Handler):
         try:
             self._open()
             self._activated = True
+            if self._discarded:
+                self.handle(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING,
+                    'levelname': 'WARNING',
+                    'msg': '%d log record(s) discarded (buffer full)',
+                    'args': (self._discarded,)}))
             for record in self._buffer:
                 self.handle(record)
             self._buffer = None
@@ -99,7 +206,99 @@ class LogHandler(logging.Handler):
                 raise ValueError(f'Unknown {level}')
         self.acquire()
         try:
-            self._buffer = [record for record in self._buffer
-                            if record.levelno >= level]
+            self._buffer = deque((record for record in self._buffer
+                                  if record.levelno >= level),
+                                 maxlen=self._buffer.maxlen)
         finally:
             self.release()
+
+
+class LogRouter(logging.Handler):
+    """Log handler that routes records to per-thread handlers.
+
+    It is used when several jobs run in one process: each job thread
+    registers its own :class:`LogHandler`. Helper threads of a job run
+    functions bound with :meth:`bind`, so that their records go to the
+    job's handler, too. Records from other threads go to the ``default``
+    handler (if any).
+
+    :param default: handler for records from unregistered threads
+    :type default: logging.Handler or None
+    """
+
+    def __init__(self, default=None):
+        super().__init__()
+        self._default = default
+        self._handlers = {}
+
+    @classmethod
+    def installed(cls):
+        """Return the router installed in the root logger or ``None``."""
+        for handler in logging.getLogger().handlers:
+            if isinstance(handler, cls):
+                return handler
+        return None
+
+    def register(self, handler):
+        """Register ``handler`` for the current thread."""
+        self._handlers[threading.get_ident()] = handler
+
+    def unregister(self):
+        """Unregister and return the handler for the current thread."""
+        return self._handlers.pop(threading.get_ident(), None)
+
+    def bind(self, func):
+        """Bind a function to the handler of the current thread.
+
+        While the returned function runs (in any thread), the records of
+        its thread go to that handler.
+
+        :param func: the function
+        :return: the bound function (``func`` if no handler is registered
+                 for the current thread)
+        """
+        handler = self._handlers.get(threading.get_ident())
+        if handler is None:
+            return func
+
+        def bound(*args, **kwargs):
+            ident = threading.get_ident()
+            prev = self._handlers.get(ident)
+            self._handlers[ident] = handler
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if prev is None:
+                    self._handlers.pop(ident, None)
+                else:
+                    self._handlers[ident] = prev
+
+        return bound
+
+    def handle(self, record):
+        """Overwrite ``handle``."""
+        handler = self._handlers.get(record.thread, self._default)
+        if handler is not None and record.levelno >= handler.level:
+            handler.handle(record)
+
+    def emit(self, record):
+        """Overwrite ``emit``."""
+
+    def close(self):
+        """Overwrite ``close``."""
+        if self._default is not None:
+            self._default.close()
+        super().close()
+
+
+def bind_to_job(func):
+    """Bind a function to the log handler of the current job thread.
+
+    See: :meth:`LogRouter.bind`
+
+    :param func: the function
+    :return: the bound function (``func`` if no :class:`LogRouter` is
+             installed)
+    """
+    router = LogRouter.installed()
+    return func if router is None else router.bind(func)
@@ -1,16 +1,30 @@
 """Mail module."""
 
+import csv
 import email
+import email.policy
+import gzip
+import io
+import itertools
 import logging
+import os
 import pprint
 import string
+import tempfile
 import textwrap
+import time
 import traceback
-from smtplib import SMTP, SMTP_SSL, SMTPException
+import uuid
+from contextlib import suppress
+from datetime import datetime, timedelta
+from smtplib import (SMTP, SMTP_SSL, SMTPException, SMTPRecipientsRefused,
+                     SMTPResponseException)
 
+import easimpconf
 from salmagundi.strings import format_timedelta
 
-from .const import ExitCodes
+from . import connpool
+from .const import SMTP_PORT, ExitCodes
 from .job import JobResult
 from .utils import read_resource
 
@@ -18,10 +32,17 @@ _logger = logging.getLogger(__name__)
 
 _mail_default = 'default'
 _mail_default_cfg = 'default.mail'
+_SPOOL_EXT = '.eml'
+_SENDING_EXT = '.sending'
+_FAILED_EXT = '.failed'
+_STALE_CLAIM = 3600  # seconds
+_ATTACHMENT_NAME = 'filelist.csv.gz'
+_SPOOLED_MAX_SIZE = 1 << 20
 _names = ['datetime_format', 'duration_format', 'stat_success', 'stat_errors',
           'stat_failure', 'stat_config', 'stat_terminated', 'stat_other',
           'status_ok', 'status_err', 'subject', 'message']
-_indentables = ['info', 'errormsg', 'stacktrace', 'filelist']
+_indentables = ['info', 'errormsg', 'stacktrace', 'filelist',
+                'connections']
 _msg_strings = {
     ExitCodes.SUCCESS: 'stat_success',
     ExitCodes.ERRORS: 'stat_errors',
@@ -87,17 +108,73 @@ def _get_addrs(app_cfg, exit_code):
     return ', '.join(map(lambda a: '%s <%s>' % (a) if a[0] else a[1], addrs))
 
 
-def _format_file_list(file_list, duration_format):
+def _notify_opt(app_cfg, job_cfg, name):
+    if job_cfg:
+        value = job_cfg['notify', name]
+        if value is not easimpconf.NOTFOUND:
+            return value
+    return app_cfg['notify', name]
+
+
+def _file_list_opts(app_cfg, job_cfg):
+    # filelist_limit 0 means no limit
+    return (_notify_opt(app_cfg, job_cfg, 'filelist_limit') or None,
+            _notify_opt(app_cfg, job_cfg, 'attach_filelist'))
+
+
+def _format_file_list(file_list, duration_format, limit, attach):
     lst = []
-    for entry in file_list:
+    for entry in itertools.islice(file_list, limit):
         try:
             s = format_timedelta(duration_format, entry[1])
         except TypeError:
             s = entry[1]
         lst.append(f'{entry[2]} {entry[0]} ({s})')
+    more = len(file_list) - len(lst)
+    if more > 0:
+        lst.append(f'... {more} more file(s)' +
+                   (f' (see attachment {_ATTACHMENT_NAME})' if attach
+                    else ''))
     return '\n'.join(lst)
 
 
+def _write_file_list(file_list, fh):
+    with gzip.GzipFile(filename=_ATTACHMENT_NAME[:-3], mode='wb',
+                       fileobj=fh) as gz, \
+            io.TextIOWrapper(gz, encoding='utf-8', newline='') as text:
+        writer = csv.writer(text)
+        writer.writerow(('path', 'tag', 'info'))
+        for path, info, tag in file_list:
+            if isinstance(info, timedelta):
+                info = f'{info.total_seconds():.3f}'
+            writer.writerow((path, tag.name, info))
+
+
+def _attach_file_list(emailmsg, file_list):
+    with tempfile.SpooledTemporaryFile(_SPOOLED_MAX_SIZE) as fh:
+        _write_file_list(file_list, fh)
+        fh.seek(0)
+        emailmsg.add_attachment(fh.read(), maintype='application',
+                                subtype='gzip', filename=_ATTACHMENT_NAME)
+
+
+def _format_connections(connect_stats):
+    if not connect_stats:
+        return '-'
+    return '\n'.join(f'{c.endpoint}: {c.total:.3f}s ({c.format_phases()})'
+                     for c in connect_stats)
+
+
+def _format_rate(bytes_per_sec):
+    for unit in ('B/s', 'KiB/s', 'MiB/s'):
+        if bytes_per_sec < 1024:
+            break
+        bytes_per_sec /= 1024
+    else:
+        unit = 'GiB/s'
+    return f'{bytes_per_sec:.1f} {unit}'
+
+
 def _indents(message, mapping):
     for line in message.splitlines():
         for s in _indentables:
@@ -136,9 +213,14 @@ def _create_mapping(app_cfg, job_cfg, mail_cfg, endtime, err, result, job_id):
         mapping['files_cnt'] = result.files_cnt
         mapping['src_error_cnt'] = result.src_error_cnt
         mapping['tgt_error_cnt'] = result.tgt_error_cnt
+        mapping['bytes_cnt'] = result.bytes_cnt
+        mapping['throughput'] = _format_rate(result.bytes_per_sec)
+        mapping['listtime'] = f'{result.list_time:.3f}s'
+        mapping['connections'] = _format_connections(result.connect_stats)
         if result.file_list:
             file_list = _format_file_list(result.file_list,
-                                          mail_cfg.duration_format)
+                                          mail_cfg.duration_format,
+                                          *_file_list_opts(app_cfg, job_cfg))
         else:
             file_list = '-'
         mapping['filelist'] = file_list
@@ -146,6 +228,10 @@ def _create_mapping(app_cfg, job_cfg, mail_cfg, endtime, err, result, job_id):
         mapping['files_cnt'] = '-'
         mapping['src_error_cnt'] = '-'
         mapping['tgt_error_cnt'] = '-'
+        mapping['bytes_cnt'] = '-'
+        mapping['throughput'] = '-'
+        mapping['listtime'] = '-'
+        mapping['connections'] = '-'
         mapping['filelist'] = '-'
     if exc is None:
         mapping['errormsg'] = '-'
@@ -169,6 +255,10 @@ def _substitute(templ, mapping):
 def send(app_cfg, job_cfg, endtime, exit_code, result, job_id=None):
     """Send email.
 
+    If ``spool_dir`` is set in the ``[mail]`` section of the application
+    configuration, the email is written to the spool directory and sent
+    later by :func:`flush_spool`.
+
     :param app_cfg: application configuration
     :type app_cfg: easimpconf.Config
     :param job_cfg: job configuration
@@ -193,27 +283,160 @@ def send(app_cfg, job_cfg, endtime, exit_code, result, job_id=None):
     emailmsg['To'] = to_addrs
     emailmsg['Subject'] = _substitute(mail_cfg.subject, mapping)
     emailmsg.set_content(_substitute(mail_cfg.message, mapping))
+    file_list = getattr(getattr(result, 'result', result), 'file_list', None)
+    limit, attach = _file_list_opts(app_cfg, job_cfg)
+    if file_list and attach and limit and len(file_list) > limit:
+        _attach_file_list(emailmsg, file_list)
     host, port = app_cfg['mail', 'host']
     _logger.debug('mail host: %s:%d', host, port)
     _logger.debug('mail security: %s', app_cfg['mail', 'security'])
-    smtp_cls = SMTP_SSL if app_cfg['mail', 'security'] == 'TLS' else SMTP
     if host == 'TEST':
+        smtp_cls = _smtp_cls(app_cfg)
         print(f'=====\nCLASS: {smtp_cls.__name__}\n')
         print(f'{emailmsg}\n=====')
-    else:
+        return
+    if app_cfg['mail', 'spool_dir']:
+        try:
+            path = _spool(app_cfg['mail', 'spool_dir'], emailmsg)
+            _logger.info('Notification spooled: %s', path)
+            return
+        except OSError as ex:
+            _logger.error('Notification not spooled: %s; sending it', ex)
+    try:
+        with _smtp_connect(app_cfg) as smtp:
+            smtp.send_message(emailmsg)
+        _logger.info('Notification sent')
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug('%s:%d\n%s', host, port,
+                          textwrap.indent(str(emailmsg), ' >'))
+    except (OSError, SMTPException):
+        msg = textwrap.indent(str(emailmsg), ' >')
+        _logger.exception(f'Notification not sent:\n{msg}')
+
+
+def _smtp_cls(app_cfg):
+    return SMTP_SSL if app_cfg['mail', 'security'] == 'TLS' else SMTP
+
+
+def _smtp_connect(app_cfg):
+    host, port = app_cfg['mail', 'host']
+    smtp = _smtp_cls(app_cfg)(host, port or SMTP_PORT)
+    try:
+        if app_cfg['mail', 'security'] == 'STARTTLS':
+            smtp.starttls()
+        smtp.login(app_cfg['mail', 'user'], app_cfg['mail', 'password'])
+    except BaseException:
+        smtp.close()
+        raise
+    return smtp
+
+
+def _smtp_check(smtp):
+    return smtp.noop()[0] == 250
+
+
+def _smtp_close(smtp):
+    with suppress(OSError, SMTPException):
+        smtp.quit()
+    smtp.close()
+
+
+def _spool(spool_dir, emailmsg):
+    spool_dir.mkdir(parents=True, exist_ok=True)
+    name = (f'{datetime.now():%Y%m%d%H%M%S%f}-{os.getpid()}'
+            f'-{uuid.uuid4().hex[:8]}')
+    tmp_path = spool_dir / f'.{name}.tmp'
+    path = spool_dir / (name + _SPOOL_EXT)
+    tmp_path.write_bytes(emailmsg.as_bytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+# spooled emails are renamed before they are sent,
+# so that no other process sends them, too
+def _claim_spooled(spool_dir):
+    now = time.time()
+    claimed = []
+    for path in sorted(spool_dir.iterdir()):
         try:
-            with smtp_cls(host, port) as smtp:
-                if app_cfg['mail', 'security'] == 'STARTTLS':
-                    smtp.starttls()
-                smtp.login(app_cfg['mail', 'user'], app_cfg['mail', 'password'])
-                smtp.send_message(emailmsg)
-            _logger.info('Notification sent')
-            if _logger.isEnabledFor(logging.DEBUG):
-                _logger.debug('%s:%d\n%s', host, port,
-                              textwrap.indent(str(emailmsg), ' >'))
-        except (OSError, SMTPException):
-            msg = textwrap.indent(str(emailmsg), ' >')
-            _logger.exception(f'Notification not sent:\n{msg}')
+            if path.suffix == _SPOOL_EXT:
+                sending = path.with_suffix(_SENDING_EXT)
+                os.replace(path, sending)
+            elif (path.suffix == _SENDING_EXT and
+                  now - path.stat().st_mtime > _STALE_CLAIM):
+                # left over by a process that was killed while sending
+                sending = path
+                os.utime(sending)
+            else:
+                continue
+        except OSError:
+            continue
+        claimed.append(sending)
+    return claimed
+
+
+def flush_spool(app_cfg):
+    """Send the spooled emails.
+
+    All emails are sent over one SMTP connection. If the connection pool
+    is enabled (daemon mode) the connection is kept open for reuse (see:
+    :mod:`filetransfer.connpool`). Emails that the server rejects
+    permanently are renamed to ``*.failed``; if the server cannot
+    be reached, the emails stay in the spool directory.
+
+    :param app_cfg: application configuration
+    :type app_cfg: easimpconf.Config
+    :return: number of sent emails and number of emails left
+    :rtype: (int, int)
+    """
+    spool_dir = app_cfg['mail', 'spool_dir']
+    if not spool_dir or not spool_dir.is_dir():
+        return 0, 0
+    paths = _claim_spooled(spool_dir)
+    if not paths:
+        return 0, 0
+    host, port = app_cfg['mail', 'host']
+    key = ('smtp', host, port, app_cfg['mail', 'user'])
+    sent = 0
+    try:
+        smtp = connpool.acquire(key, lambda: _smtp_connect(app_cfg),
+                                _smtp_check)
+    except (OSError, SMTPException) as ex:
+        _logger.error('Spooled notifications not sent: %s', ex)
+        _unclaim(paths)
+        return 0, len(paths)
+    try:
+        for i, path in enumerate(paths):
+            msg = email.message_from_bytes(path.read_bytes(),
+                                           policy=email.policy.SMTP)
+            try:
+                smtp.send_message(msg)
+            except SMTPResponseException as ex:
+                if ex.smtp_code < 500:
+                    raise
+                _logger.error('Notification %s rejected: %s', path.stem, ex)
+                os.replace(path, path.with_suffix(_FAILED_EXT))
+                continue
+            except SMTPRecipientsRefused as ex:
+                _logger.error('Notification %s rejected: %s', path.stem, ex)
+                os.replace(path, path.with_suffix(_FAILED_EXT))
+                continue
+            path.unlink()
+            sent += 1
+            _logger.info('Notification sent: %s', path.stem)
+    except (OSError, SMTPException) as ex:
+        _logger.error('Spooled notifications not sent: %s', ex)
+        _smtp_close(smtp)
+        _unclaim(paths[i:])
+        return sent, len(paths) - i
+    connpool.release(key, smtp, _smtp_close)
+    return sent, 0
+
+
+def _unclaim(paths):
+    for path in paths:
+        with suppress(OSError):
+            os.replace(path, path.with_suffix(_SPOOL_EXT))
 
 
 if __name__ == '__main__':
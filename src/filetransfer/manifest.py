@@ -0,0 +1,143 @@
+"""Manifests of source files.
+
+A manifest is a file in the source directory that lists the files to
+transfer, so the source directory does not have to be listed. Paths are
+relative to the source base path with ``/`` as separator.
+
+Two formats are supported:
+
+- plain text (any file name not ending with ``.json``): one path per
+  line; empty lines and lines starting with ``#`` are ignored.
+- JSON (file name ending with ``.json``): a list (or an object with the
+  list as item ``files``) of paths or objects with the items ``path`` and
+  optionally ``size`` and a checksum as hex string with the name of the
+  hash algorithm as key (e.g. ``sha256``; see
+  :data:`hashlib.algorithms_guaranteed`).
+
+.. versionadded:: 0.12.0
+"""
+
+import hashlib
+import json
+import logging
+from collections import namedtuple
+
+_ALGORITHMS = sorted(a for a in hashlib.algorithms_guaranteed
+                     if not a.startswith('shake_'))
+
+_logger = logging.getLogger(__name__)
+
+#: A file in a manifest; ``size``, ``algorithm`` and ``checksum`` may
+#: be ``None``.
+Entry = namedtuple('Entry', 'path size algorithm checksum')
+
+
+class VerificationError(ValueError):
+    """Raised when a file does not match its manifest entry."""
+
+
+def parse(data, is_json=False):
+    """Parse a manifest.
+
+    Absolute paths and paths with ``..`` components are ignored.
+
+    :param bytes data: the manifest
+    :param bool is_json: ``True`` if the manifest is in JSON format
+    :return: the entries in the order of the manifest without duplicates
+    :rtype: list(Entry)
+    :raises ValueError: if the manifest is invalid
+    """
+    text = data.decode('utf-8')
+    if is_json:
+        entries = _parse_json(text)
+    else:
+        entries = [Entry(line, None, None, None)
+                   for line in (s.strip() for s in text.splitlines())
+                   if line and not line.startswith('#')]
+    result = {}
+    for entry in entries:
+        parts = entry.path.split('/')
+        if entry.path.startswith('/') or '..' in parts:
+            _logger.error('Manifest: %s ignored (path outside source)',
+                          entry.path)
+            continue
+        path = '/'.join(p for p in parts if p not in ('', '.'))
+        if path and path not in result:
+            result[path] = entry._replace(path=path)
+    return list(result.values())
+
+
+def _parse_json(text):
+    doc = json.loads(text)
+    if isinstance(doc, dict):
+        doc = doc.get('files')
+    if not isinstance(doc, list):
+        raise ValueError('manifest: list of files expected')
+    entries = []
+    for item in doc:
+        if isinstance(item, str):
+            entries.append(Entry(item, None, None, None))
+            continue
+        if not isinstance(item, dict) or not isinstance(item.get('path'),
+                                                        str):
+            raise ValueError(f'manifest: invalid entry {item!r}')
+        size = item.get('size')
+        if size is not None and not (isinstance(size, int) and size >= 0):
+            raise ValueError(f'manifest: invalid size in entry {item!r}')
+        algorithm = next((a for a in _ALGORITHMS if a in item), None)
+        checksum = None
+        if algorithm is not None:
+            checksum = str(item[algorithm]).lower()
+        entries.append(Entry(item['path'], size, algorithm, checksum))
+    return entries
+
+
+class VerifyingReader:
+    """Reader that verifies the size and checksum of a file while it is
+    read.
+
+    :param reader: the file reader
+    :type reader: :term:`binary file` opened in read-mode
+    :param Entry entry: the manifest entry of the file
+    :raises VerificationError: in :meth:`read` if the file is bigger than
+                               expected or at the end of the file if the
+                               size or the checksum does not match
+    """
+
+    def __init__(self, reader, entry):
+        self._reader = reader
+        self._entry = entry
+        self._size = 0
+        self._hash = hashlib.new(entry.algorithm) if entry.checksum else None
+
+    def read(self, size=-1):
+        """Read up to ``size`` bytes."""
+        data = self._reader.read(size)
+        if data:
+            self._size += len(data)
+            if self._hash is not None:
+                self._hash.update(data)
+            if self._entry.size is not None and self._size > self._entry.size:
+                raise VerificationError(
+                    f'size more than {self._entry.size} bytes')
+        else:
+            self._verify()
+        return data
+
+    def _verify(self):
+        entry = self._entry
+        if entry.size is not None and self._size != entry.size:
+            raise VerificationError(
+                f'size {self._size} bytes, expected {entry.size} bytes')
+        if self._hash is not None and self._hash.hexdigest() != entry.checksum:
+            raise VerificationError(f'{entry.algorithm} checksum mismatch')
+
+    def close(self):
+        """Close the reader."""
+        self._reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
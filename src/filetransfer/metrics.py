@@ -0,0 +1,130 @@
+"""Metrics module.
+
+Writes the metrics of a job run to a file in the text format that
+the textfile collector of the Prometheus node exporter reads.
+"""
+
+import logging
+import os
+
+from .const import ExitCodes, FileTags
+
+_PREFIX = 'filetransfer_'
+_FILE_FORMAT = 'filetransfer_{}.prom'
+
+_logger = logging.getLogger(__name__)
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _format(metrics, job_id):
+    lines = []
+    for name, help_, samples in metrics:
+        lines.append(f'# HELP {_PREFIX}{name} {help_}')
+        lines.append(f'# TYPE {_PREFIX}{name} gauge')
+        for labels, value in samples:
+            labels = dict(job=job_id, **labels)
+            label_str = ','.join(f'{k}="{_escape(v)}"'
+                                 for k, v in labels.items())
+            lines.append(f'{_PREFIX}{name}{{{label_str}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _connect_phases(tstats):
+    phases = {}
+    for cstats in tstats.connects:
+        for phase, t in cstats.phases.items():
+            key = (cstats.endpoint, phase)
+            phases[key] = phases.get(key, 0.0) + t
+    return phases
+
+
+def _connect_counts(tstats):
+    counts = {}
+    for cstats in tstats.connects:
+        key = (cstats.endpoint, cstats.reused)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def collect(end_time, exit_code, result, tstats, start_time):
+    """Return the metrics of a job run.
+
+    :return: list of tuples (name, help text, samples); samples is
+             a list of tuples (labels, value)
+    :rtype: list
+    """
+    if isinstance(result, BaseException):
+        result = getattr(result, 'result', None)
+    code = exit_code.code if exit_code else ExitCodes.FAILURE.code
+    metrics = [
+        ('last_run_timestamp_seconds', 'End time of the last run.',
+         [({}, f'{end_time.timestamp():.3f}')]),
+        ('duration_seconds', 'Duration of the last run.',
+         [({}, f'{(end_time - start_time).total_seconds():.3f}')]),
+        ('exit_code', 'Exit code of the last run.', [({}, code)]),
+        ('retries', 'Number of retries in the last run.',
+         [({}, tstats.retries)]),
+        ('connect_seconds', 'Time for connecting to the servers.',
+         [({}, f'{tstats.connect_time:.3f}')]),
+        ('list_seconds', 'Time for listing the source directories.',
+         [({}, f'{tstats.list_time:.3f}')]),
+        ('connect_phase_seconds',
+         'Time for the phases of the connection setups.',
+         [({'endpoint': endpoint, 'phase': phase}, f'{t:.3f}')
+          for (endpoint, phase), t in _connect_phases(tstats).items()]),
+        ('connects', 'Number of connection setups.',
+         [({'endpoint': endpoint, 'reused': str(reused).lower()}, cnt)
+          for (endpoint, reused), cnt in _connect_counts(tstats).items()]),
+    ]
+    if result is not None:
+        counts = {
+            FileTags.TRANSF: result.files_cnt,
+            FileTags.SRCERR: result.src_error_cnt,
+            FileTags.TGTERR: result.tgt_error_cnt,
+        }
+        metrics += [
+            ('files', 'Number of files by tag (see: FileTags).',
+             [({'tag': tag.name}, cnt) for tag, cnt in counts.items()]),
+            ('bytes', 'Number of bytes transferred.',
+             [({}, result.bytes_cnt)]),
+            ('transfer_seconds', 'Time for transferring the files.',
+             [({}, f'{result.transfer_time:.3f}')]),
+            ('bytes_per_second', 'Aggregate transfer rate.',
+             [({}, f'{result.bytes_per_sec:.1f}')]),
+        ]
+    return metrics
+
+
+def write_textfile(app_cfg, job_cfg, end_time, exit_code, result, tstats):
+    """Write the metrics of a job run.
+
+    The file is replaced atomically so that the collector never reads
+    a partially written file.
+
+    :param app_cfg: application configuration
+    :type app_cfg: easimpconf.Config
+    :param job_cfg: job configuration
+    :type job_cfg: easimpconf.Config
+    :param datetime.datetime end_time: end time of job
+    :param exit_code: exit code
+    :type exit_code: filetransfer.const.ExitCodes
+    :param result: job result or exception
+    :param tstats: statistics not related to a single file
+    :type tstats: filetransfer.stats.TransferStats
+    """
+    job_id = job_cfg['job_id']
+    path = app_cfg['metrics', 'textfile_dir'] / _FILE_FORMAT.format(job_id)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}')
+    try:
+        metrics = collect(end_time, exit_code, result, tstats,
+                          app_cfg['start_time'])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(_format(metrics, job_id))
+        os.replace(tmp_path, path)
+        _logger.debug('metrics written: %s', path)
+    except OSError as ex:
+        _logger.error('Metrics not written: %s', ex)
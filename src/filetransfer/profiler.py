@@ -0,0 +1,230 @@
+"""Profiling of job runs.
+
+Two modes are supported:
+
+- ``cprofile``: deterministic profiling with :mod:`cProfile`; the
+  statistics are written in the :mod:`pstats` format.
+- ``sampling``: the stack of the job's thread is sampled every
+  ``interval`` seconds by a background thread; the samples are written
+  as collapsed stacks (one line per stack: frames separated by ``;``
+  followed by the number of samples) as used by flame graph tools.
+  The overhead is much lower than with ``cprofile``.
+
+In both modes a summary of the top functions is logged when the job
+has finished. Helper threads of a job (e.g. the workers of a parallel
+listing) run functions bound with :func:`bind`, so that they are
+profiled, too.
+
+If several jobs run concurrently in one process (several job ids or
+daemon mode) the ``sampling`` mode is always used, because only one
+:mod:`cProfile` profiler can be active at a time (Python 3.12+).
+"""
+
+import io
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from .loghandler import LogRouter
+
+_FILE_FORMAT = '{}_{:%Y%m%d-%H%M%S}'
+_SUFFIXES = {'cprofile': '.prof', 'sampling': '.collapsed'}
+
+_profilers = {}  # thread ident -> profiler of the job
+
+_logger = logging.getLogger(__name__)
+
+
+def run(app_cfg, job_cfg, func, *args):
+    """Run ``func(*args)`` with the profiler.
+
+    :param app_cfg: application configuration
+    :type app_cfg: easimpconf.Config
+    :param job_cfg: job configuration
+    :type job_cfg: easimpconf.Config
+    :return: the return value of ``func``
+    """
+    mode = app_cfg['profile', 'mode']
+    if mode == 'cprofile' and LogRouter.installed():
+        # several jobs run in threads of this process
+        _logger.info('Profiler: sampling mode is used with several jobs')
+        mode = 'sampling'
+    path = _output_path(app_cfg, job_cfg, mode)
+    top = app_cfg['profile', 'top']
+    if mode == 'sampling':
+        profiler = Sampler(app_cfg['profile', 'interval'])
+    else:
+        profiler = _CProfiler()
+    ident = threading.get_ident()
+    profiler.enable()
+    _profilers[ident] = profiler
+    try:
+        return func(*args)
+    finally:
+        del _profilers[ident]
+        profiler.disable()
+        try:
+            if mode == 'sampling':
+                profiler.write_collapsed(path)
+                summary = profiler.summary(top)
+            else:
+                stream = io.StringIO()
+                stats = profiler.stats(stream)
+                stats.dump_stats(path)
+                stats.sort_stats('tottime').print_stats(top)
+                summary = stream.getvalue()
+            _logger.info('Profile written: %s\n%s', path, summary.rstrip())
+        except OSError as ex:
+            _logger.error('Profile not written: %s', ex)
+
+
+def bind(func):
+    """Bind a function to the profiler of the current job thread.
+
+    While the returned function runs (in any thread), its thread is
+    profiled, too.
+
+    :param func: the function
+    :return: the bound function (``func`` if the job does not run with
+             the profiler)
+    """
+    profiler = _profilers.get(threading.get_ident())
+    if profiler is None:
+        return func
+
+    def bound(*args, **kwargs):
+        with profiler.thread():
+            return func(*args, **kwargs)
+
+    return bound
+
+
+def _output_path(app_cfg, job_cfg, mode):
+    if app_cfg['profile', 'file']:
+        return app_cfg['profile', 'file']
+    log_path = app_cfg['log_path']
+    if log_path:
+        return log_path.with_suffix(_SUFFIXES[mode])
+    return (_FILE_FORMAT.format(job_cfg['job_id'], datetime.now()) +
+            _SUFFIXES[mode])
+
+
+class _CProfiler:
+    # cProfile of the job thread and its helper threads
+
+    def __init__(self):
+        import cProfile
+        self._cls = cProfile.Profile
+        self._profiles = [self._cls()]
+
+    def enable(self):
+        self._profiles[0].enable()
+
+    def disable(self):
+        self._profiles[0].disable()
+
+    @contextmanager
+    def thread(self):
+        profile = self._cls()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: another profiler is active
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._profiles.append(profile)
+
+    def stats(self, stream):
+        import pstats
+        return pstats.Stats(*self._profiles, stream=stream)
+
+
+class Sampler:
+    """Sampling profiler for the thread that calls :meth:`enable`.
+
+    Other threads are sampled while they are in the context of
+    :meth:`thread`.
+
+    :param float interval: seconds between two samples
+    """
+
+    def __init__(self, interval=0.005):
+        self._interval = interval
+        self._samples = Counter()
+        self._threads = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def enable(self):
+        """Start sampling the current thread."""
+        self._threads.add(threading.get_ident())
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample,
+                                        name='Sampler', daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        """Stop sampling."""
+        self._stop.set()
+        self._thread.join()
+        self._threads.discard(threading.get_ident())
+
+    @contextmanager
+    def thread(self):
+        """Context manager for sampling the current thread, too."""
+        ident = threading.get_ident()
+        self._threads.add(ident)
+        try:
+            yield
+        finally:
+            self._threads.discard(ident)
+
+    def _sample(self):
+        labels = {}
+        while not self._stop.wait(self._interval):
+            frames = sys._current_frames()
+            for ident in tuple(self._threads):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = (
+                            f'{code.co_name} '
+                            f'({os.path.basename(code.co_filename)}'
+                            f':{code.co_firstlineno})')
+                    stack.append(label)
+                    frame = frame.f_back
+                if stack:
+                    stack.reverse()
+                    self._samples[tuple(stack)] += 1
+
+    def write_collapsed(self, path):
+        """Write the samples as collapsed stacks."""
+        with open(path, 'w') as fh:
+            for stack, count in self._samples.most_common():
+                fh.write(f'{";".join(stack)} {count}\n')
+
+    def summary(self, top):
+        """Return a summary of the ``top`` functions by own samples."""
+        total = sum(self._samples.values()) or 1
+        own, cum = Counter(), Counter()
+        for stack, count in self._samples.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                cum[label] += count
+        lines = [f'{total} samples ({self._interval * 1000:g} ms interval)',
+                 '   own%    cum%  function']
+        for label, count in own.most_common(top):
+            lines.append(f'{count / total * 100:6.1f}  '
+                         f'{cum[label] / total * 100:6.1f}  {label}')
+        return '\n'.join(lines)
@@ -0,0 +1,241 @@
+"""Compact store for the outcomes of the files of a job.
+
+For every transferred file only the interned directory prefix, the file
+name and the numbers of its :class:`~filetransfer.FileStats` are kept in
+:mod:`array` columns; errors are stored as their message. If more than
+``spill_threshold`` files were transferred (or failed), the records are
+sorted and written to a temporary file in batches. The sorted runs are
+merged when the records are iterated, so the records are never sorted
+in memory as a whole. The temporary file is removed when the records
+are garbage collected.
+
+For skipping files that were already transferred (in a retry) and for
+counting the errors only a 128-bit digest of every path is kept in
+memory.
+"""
+
+import hashlib
+import heapq
+import os
+import pickle
+import tempfile
+import threading
+from array import array
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from .const import FileTags
+from .stats import FileStats
+
+SPILL_THRESHOLD = 100_000
+_BATCH_SIZE = 1000
+
+
+def error_message(exc):
+    """Return the first line of the text of an exception."""
+    return str(exc).split('\n')[0]
+
+
+def _digest(path):
+    return int.from_bytes(
+        hashlib.blake2b(path.encode('utf-8', 'surrogateescape'),
+                        digest_size=16).digest(), 'big')
+
+
+def _split(path):
+    i = max(path.rfind('/'), path.rfind(os.sep)) + 1
+    return path[:i], path[i:]
+
+
+class FileRecords:
+    """Outcomes of the files of a job.
+
+    :param bool collect_data: if ``False`` only the counts are kept
+    :param int spill_threshold: number of records kept in memory
+    """
+
+    def __init__(self, collect_data=True, spill_threshold=SPILL_THRESHOLD):
+        self.collect_data = collect_data
+        self._threshold = spill_threshold
+        self._dirs = {}
+        self._msgs = {}
+        self._digests = set()
+        self._error_digests = {}  # digest -> source error
+        self._errors = []  # [(path, source error, message), ...]
+        self._runs = []  # [[(offset, length), ...], ...]
+        self._error_runs = []
+        self._file = None
+        self._lock = threading.Lock()
+        self._clear_chunk()
+        self.files_cnt = 0
+        self.bytes_cnt = 0
+        self.transfer_time = 0.0
+
+    def _clear_chunk(self):
+        self._dir_col = []
+        self._name_col = []
+        self._size_col = array('q')
+        self._time_col = array('d')  # duration, open, ttfb, rename
+
+    def add(self, path, value):
+        """Add the outcome of a file.
+
+        :param str path: the file path
+        :param value: the statistics or a tuple (True|False, exc) --
+                      True: source error, False: target error
+        :type value: filetransfer.FileStats or tuple
+        """
+        digest = _digest(path)
+        if isinstance(value, tuple):
+            msg = error_message(value[1])
+            self._error_digests[digest] = value[0]
+            self._errors.append((path, value[0],
+                                 self._msgs.setdefault(msg, msg)))
+            if len(self._errors) >= self._threshold:
+                self._spill_errors()
+            return
+        self._error_digests.pop(digest, None)
+        self._digests.add(digest)
+        self.files_cnt += 1
+        self.bytes_cnt += value.size
+        duration = value.duration.total_seconds()
+        self.transfer_time += duration
+        if not self.collect_data:
+            return
+        dir_, name = _split(path)
+        self._dir_col.append(self._dirs.setdefault(dir_, dir_))
+        self._name_col.append(name)
+        self._size_col.append(value.size)
+        self._time_col.extend((duration, value.open_time, value.ttfb,
+                               value.rename_time))
+        if len(self._name_col) >= self._threshold:
+            self._spill()
+
+    def transferred(self, path):
+        """Return ``True`` if the file was transferred."""
+        return _digest(path) in self._digests
+
+    @property
+    def src_error_cnt(self):
+        """Return the number of source errors."""
+        return sum(1 for src in self._error_digests.values() if src)
+
+    @property
+    def tgt_error_cnt(self):
+        """Return the number of target errors."""
+        return len(self._error_digests) - self.src_error_cnt
+
+    def __len__(self):
+        return self.files_cnt + len(self._error_digests)
+
+    def _chunk_records(self):
+        dirs, names = self._dir_col, self._name_col
+        sizes, times = self._size_col, self._time_col
+        for i in sorted(range(len(names)), key=lambda i: dirs[i] + names[i]):
+            yield (dirs[i] + names[i], sizes[i]) + tuple(times[4*i:4*i+4])
+
+    def _write_run(self, records):
+        with self._lock:
+            if self._file is None:
+                self._file = tempfile.TemporaryFile(prefix='filetransfer-')
+            self._file.seek(0, os.SEEK_END)
+            run = []
+            it = iter(records)
+            while True:
+                batch = [r for _, r in zip(range(_BATCH_SIZE), it)]
+                if not batch:
+                    break
+                data = pickle.dumps(batch, pickle.HIGHEST_PROTOCOL)
+                run.append((self._file.tell(), len(data)))
+                self._file.write(data)
+        return run
+
+    def _spill(self):
+        self._runs.append(self._write_run(self._chunk_records()))
+        self._clear_chunk()
+
+    def _spill_errors(self):
+        # sorted by path only, so that the order of the errors of a path
+        # is kept
+        self._errors.sort(key=itemgetter(0))
+        self._error_runs.append(self._write_run(self._errors))
+        self._errors = []
+        self._msgs.clear()
+
+    def _run_records(self, run):
+        for offset, length in run:
+            with self._lock:
+                self._file.seek(offset)
+                data = self._file.read(length)
+            yield from pickle.loads(data)
+
+    def _records(self):
+        iters = [self._run_records(run) for run in self._runs]
+        iters.append(self._chunk_records())
+        return heapq.merge(*iters, key=itemgetter(0))
+
+    def _error_records(self):
+        iters = [self._run_records(run) for run in self._error_runs]
+        iters.append(sorted(self._errors, key=itemgetter(0)))
+        # the last error of a path is its outcome unless it was
+        # transferred in a retry
+        for path, group in groupby(heapq.merge(*iters, key=itemgetter(0)),
+                                   key=itemgetter(0)):
+            *_, record = group
+            if _digest(path) in self._error_digests:
+                yield record
+
+    def entries(self):
+        """Return an iterator over the entries (path, info, tag) sorted by
+        path.
+
+        ``info`` is the duration of the transfer (:class:`datetime.timedelta`)
+        or the error text.
+        """
+        transf = ((r[0], timedelta(seconds=r[2]), FileTags.TRANSF)
+                  for r in self._records())
+        errors = ((path, msg, FileTags.SRCERR if src else FileTags.TGTERR)
+                  for path, src, msg in self._error_records())
+        return heapq.merge(transf, errors, key=itemgetter(0))
+
+    def stats(self):
+        """Return an iterator over the tuples (path, FileStats) sorted by path.
+
+        Only transferred files are included.
+        """
+        for path, size, duration, open_time, ttfb, rename_time in \
+                self._records():
+            stats = FileStats()
+            stats.duration = timedelta(seconds=duration)
+            stats.size = size
+            stats.open_time = open_time
+            stats.ttfb = ttfb
+            stats.rename_time = rename_time
+            yield path, stats
+
+
+class RecordView:
+    """Lazy, sorted view of file records.
+
+    The view can be iterated several times; the entries are created
+    during iteration. ``len()`` returns the number of entries.
+
+    .. versionadded:: 0.12.0
+    """
+
+    def __init__(self, iterate, length):
+        self._iterate = iterate
+        self._length = length
+
+    def __iter__(self):
+        return iter(self._iterate())
+
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} of {self._length} entries>'
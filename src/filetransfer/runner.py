@@ -0,0 +1,170 @@
+"""Run several jobs in one process.
+
+Each job runs in its own thread and writes its own log file; the log
+records are routed by a :class:`~filetransfer.loghandler.LogRouter`.
+The jobs share a :class:`~filetransfer.hooks.TransferHooks` object
+that is cancelled when the process is terminated, so that running jobs
+stop before the next file or chunk.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+
+from . import config, job
+from .const import ExitCodes
+from .exceptions import ConfigError, Error, Terminated
+from .hooks import TransferHooks
+from .loghandler import LogRouter
+
+_DEFAULT_FORMAT = '%(asctime)s %(levelname)-8s %(message)s'
+
+_logger = logging.getLogger(__name__)
+
+
+def install_router(level):
+    """Install a :class:`LogRouter` in the root logger if necessary.
+
+    :param level: log level for records that do not belong to a job
+    :return: the router
+    :rtype: LogRouter
+    """
+    router = LogRouter.installed()
+    if router is None:
+        default = logging.StreamHandler()
+        default.setFormatter(logging.Formatter(_DEFAULT_FORMAT))
+        default.setLevel(level)
+        router = LogRouter(default)
+        root = logging.getLogger()
+        root.setLevel(logging.NOTSET)
+        root.addHandler(router)
+    return router
+
+
+def find_jobs(app_cfg, patterns):
+    """Return the job ids matching the patterns.
+
+    A pattern without wildcards is returned as is; else it is matched
+    against the job configuration files in ``jobs_dir``.
+
+    :param app_cfg: the application configuration
+    :type app_cfg: easimpconf.Config
+    :param patterns: job ids or glob-style patterns
+    :return: job ids (without duplicates)
+    :rtype: list
+    :raises ConfigError: if a pattern does not match any job
+    """
+    jobs_dir = app_cfg['global', 'jobs_dir']
+    ext = app_cfg['global', 'job_cfg_ext']
+    all_ids = None
+    job_ids = []
+    for pattern in patterns:
+        if not any(c in pattern for c in '*?['):
+            matches = [pattern]
+        else:
+            if all_ids is None:
+                all_ids = sorted(p.name[:-len(ext)]
+                                 for p in jobs_dir.glob('*' + ext))
+            matches = [x for x in all_ids if fnmatchcase(x, pattern)]
+            if not matches:
+                raise ConfigError(f'no job matches {pattern!r}')
+        job_ids.extend(x for x in matches if x not in job_ids)
+    return job_ids
+
+
+def run_job(cfg_file, job_id, profile=False, source_paths=None, hooks=None):
+    """Run a job in the current thread.
+
+    The job's log handler is unregistered and closed when the job
+    has finished.
+
+    :param cfg_file: the application configuration file
+    :type cfg_file: :term:`path-like object`
+    :param str job_id: the job id
+    :param bool profile: if ``True`` the job runs with the profiler
+    :param source_paths: if given, only these files are transferred
+                         (see: :func:`filetransfer.config.configure`)
+    :param hooks: event hooks (e.g. for cancelling the job)
+    :type hooks: filetransfer.hooks.TransferHooks
+    :return: job result (or ``None``), exit code and exception (or ``None``)
+    :rtype: (JobResult, int, BaseException)
+    """
+    result, exc = None, None
+    try:
+        app_cfg, job_cfg = config.configure(cfg_file, job_id,
+                                            source_paths=source_paths)
+        if profile:
+            app_cfg['profile', 'enabled'] = True
+        result, status = job.run(app_cfg, job_cfg, hooks=hooks)
+    except (Error, Terminated) as ex:
+        result, status, exc = getattr(ex, 'result', None), ex.code, ex
+    except Exception as ex:
+        _logger.critical('Error: %s', ex, exc_info=True)
+        result, status, exc = None, ExitCodes.FAILURE.code, ex
+    finally:
+        router = LogRouter.installed()
+        handler = router.unregister() if router else None
+        if handler is not None:
+            handler.close()
+    return result, status, exc
+
+
+def run_jobs(cfg_file, job_ids, max_workers, profile=False):
+    """Run jobs concurrently.
+
+    If the process is terminated (:exc:`KeyboardInterrupt` or
+    :exc:`~filetransfer.Terminated`) while the jobs run, the jobs that
+    have not started are cancelled and the running jobs are stopped;
+    they get the exit code for ``terminated``.
+
+    :param cfg_file: the application configuration file
+    :type cfg_file: :term:`path-like object`
+    :param list job_ids: the job ids
+    :param int max_workers: maximum number of jobs running at the same time
+    :param bool profile: if ``True`` the jobs run with the profiler
+    :return: list of tuples ``(job_id, result, exit code, exception)``
+             in the order of ``job_ids``
+    :rtype: list
+    """
+    hooks = TransferHooks()
+    with ThreadPoolExecutor(max(1, max_workers)) as executor:
+        futures = [executor.submit(run_job, cfg_file, job_id, profile,
+                                   hooks=hooks)
+                   for job_id in job_ids]
+        try:
+            for future in futures:
+                future.result()
+        except (KeyboardInterrupt, Terminated) as ex:
+            _logger.info('Jobs terminated: %s', ex.__class__.__name__)
+            cancel(hooks, futures)
+    results = []
+    for job_id, future in zip(job_ids, futures):
+        if future.cancelled():
+            results.append((job_id, None, Terminated.code,
+                            Terminated('not started')))
+        else:
+            results.append((job_id,) + future.result())
+    return results
+
+
+def cancel(hooks, futures):
+    """Cancel jobs.
+
+    :param hooks: the hooks the running jobs were started with
+    :type hooks: filetransfer.hooks.TransferHooks
+    :param futures: the futures of the jobs; jobs that have not started
+                    are not run
+    """
+    hooks.cancel()
+    for future in futures:
+        future.cancel()
+
+
+def combined_exit_code(codes):
+    """Return the most severe exit code.
+
+    :param codes: exit codes
+    :return: exit code
+    :rtype: int
+    """
+    return max(codes, default=ExitCodes.SUCCESS.code)
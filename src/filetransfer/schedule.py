@@ -0,0 +1,138 @@
+"""Job schedules for the daemon mode.
+
+A schedule is either an interval (``every 5m``) or a cron expression
+with the five fields minute, hour, day of month, month and day of week
+(``*/5 * * * *``). The aliases ``@hourly``, ``@daily``, ``@weekly``,
+``@monthly`` and ``@yearly`` are supported as well.
+"""
+
+from datetime import datetime, timedelta
+
+from .utils import parse_duration
+
+_ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+}
+
+# (name, min, max)
+_FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day of month', 1, 31),
+           ('month', 1, 12), ('day of week', 0, 7))
+
+_MAX_YEARS = 5
+
+
+class Interval:
+    """Run a job every ``seconds`` seconds.
+
+    :param float seconds: interval in seconds
+    """
+
+    def __init__(self, seconds):
+        if seconds <= 0:
+            raise ValueError('interval must be greater than 0')
+        self._delta = timedelta(seconds=seconds)
+
+    def next_time(self, after):
+        """Return the next run time after ``after``."""
+        return after + self._delta
+
+    def __repr__(self):
+        return f'Interval({self._delta.total_seconds()!r})'
+
+
+class Cron:
+    """Run a job according to a cron expression.
+
+    :param str expr: cron expression with five fields
+    """
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != len(_FIELDS):
+            raise ValueError(f'cron expression needs {len(_FIELDS)} fields:'
+                             f' {expr!r}')
+        self._expr = expr
+        (self._minutes, self._hours, self._days,
+         self._months, self._weekdays) = (_parse_field(f, *spec)
+                                          for f, spec in zip(fields, _FIELDS))
+        if 7 in self._weekdays:
+            self._weekdays = (self._weekdays - {7}) | {0}
+        self._dom_star = fields[2] == '*'
+        self._dow_star = fields[4] == '*'
+
+    def _day_matches(self, dt):
+        dom = dt.day in self._days
+        dow = (dt.weekday() + 1) % 7 in self._weekdays
+        if self._dom_star:
+            return dow
+        if self._dow_star:
+            return dom
+        return dom or dow
+
+    def next_time(self, after):
+        """Return the next run time after ``after``."""
+        dt = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = after + timedelta(days=366 * _MAX_YEARS)
+        while dt <= limit:
+            if dt.month not in self._months:
+                if dt.month == 12:
+                    dt = dt.replace(year=dt.year + 1, month=1, day=1,
+                                    hour=0, minute=0)
+                else:
+                    dt = dt.replace(month=dt.month + 1, day=1,
+                                    hour=0, minute=0)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self._hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self._minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f'no run time found for {self._expr!r}')
+
+    def __repr__(self):
+        return f'Cron({self._expr!r})'
+
+
+def _parse_field(s, name, min_, max_):
+    values = set()
+    for part in s.split(','):
+        rng, _, step = part.partition('/')
+        try:
+            step = int(step) if step else 1
+            if rng == '*':
+                lo, hi = min_, max_
+            elif '-' in rng:
+                lo, hi = map(int, rng.split('-', 1))
+            else:
+                lo = int(rng)
+                hi = max_ if step > 1 else lo
+        except ValueError:
+            raise ValueError(f'invalid {name} field: {s!r}') from None
+        if step < 1 or lo < min_ or hi > max_ or lo > hi:
+            raise ValueError(f'invalid {name} field: {s!r}')
+        values.update(range(lo, hi + 1, step))
+    return values
+
+
+def parse_schedule(s):
+    """Parse a schedule.
+
+    :param str s: ``every <duration>`` or a cron expression
+    :return: schedule object with a method ``next_time(after)``
+    :rtype: Interval or Cron
+    :raises ValueError: if ``s`` is not a valid schedule or a cron
+                        expression never matches (e.g. ``0 0 31 2 *``)
+    """
+    s = s.strip()
+    if s.lower().startswith('every '):
+        return Interval(parse_duration(s[6:]))
+    cron = Cron(_ALIASES.get(s.lower(), s))
+    cron.next_time(datetime.now())
+    return cron
@@ -5,12 +5,13 @@ import posixpath
 import stat
 from contextlib import suppress
 
-from paramiko import (HostKeys, SSHException, Transport,
+from paramiko import (SSHException, Transport,
                       RSAKey, DSSKey, ECDSAKey, Ed25519Key)
 
-from . import utils
+from . import connpool, utils
 from .base import BaseSource, BaseTarget
 from .exceptions import ConnectError
+from .knownhosts import KnownHosts
 
 _logger = logging.getLogger(__name__)
 
@@ -26,12 +27,16 @@ class _Sftp:
     def __init__(self, job_cfg, host_cfg):
         super().__init__(job_cfg)
         self._host_cfg = host_cfg
-        self._conn = self._connect()
         self._path_join = posixpath.join
+        self._conn = self._acquire(self._pool_key(), self._connect,
+                                   self._check_conn)
+        self._bind()
+
+    def _bind(self):
         self._open = self._conn.open
         self._remove = self._conn.remove
 
-    def _connect(self):
+    def _connect(self, cstats):
         host_id = self._host_cfg['host_id']
         host, port = self._host_cfg[host_id, 'host']
         user = self._host_cfg[host_id, 'user']
@@ -41,34 +46,102 @@ class _Sftp:
         key_type = self._host_cfg[host_id, 'key_type']
         key_file = self._host_cfg[host_id, 'key_file']
         key_pass = self._host_cfg[host_id, 'key_pass']
+        transport = None
         try:
             if key_type:
                 key = _KEY_TYPES[key_type](filename=key_file, password=key_pass)
                 _logger.debug('private key: %s', key.get_name())
+                cstats.mark('key')
             else:
                 key = None
             hostname = utils.format_knownhost(host, port)
-            hostkeys = HostKeys(known_hosts)
-            transport = Transport((host, port))
+            addrinfos = utils.resolve(host, port)
+            cstats.mark('dns')
+            sock = utils.create_connection(addrinfos, timeout)
+            cstats.mark('tcp')
+            transport = Transport(sock)
             transport.start_client(timeout=timeout)
+            cstats.mark('kex')
             hostkey = transport.get_remote_server_key()
-            if not hostkeys.check(hostname, hostkey):
+            if not KnownHosts.load(known_hosts, self._host_cfg[
+                    'cache_dir']).check(hostname, hostkey):
                 raise SSHException('Incorrect hostkey')
+            cstats.mark('hostkey')
             if key:
                 transport.auth_publickey(user, key)
             else:
                 transport.auth_password(user, passwd)
+            cstats.mark('auth')
             client = transport.open_sftp_client()
             client.get_channel().settimeout(timeout)
+            cstats.mark('channel')
             _logger.debug('client for %s created', hostname)
             return client
         except (OSError, SSHException) as ex:
+            if transport is not None:
+                transport.close()
             raise ConnectError(f'Connection to server "{host}:{port}"'
                                f' failed: {ex.args!s}')
 
-    def _close(self):
+    def _pool_key(self):
+        host_id = self._host_cfg['host_id']
+        return (('SFTP',) + self._host_cfg[host_id, 'host'] +
+                tuple(self._host_cfg[host_id, opt]
+                      for opt in ('user', 'password', 'key_type', 'key_file',
+                                  'key_pass', 'known_hosts')))
+
+    @staticmethod
+    def _check_conn(conn):
+        channel = conn.get_channel()
+        return not channel.closed and channel.get_transport().is_active()
+
+    @staticmethod
+    def _disconnect(conn):
         with suppress(Exception):
-            self._conn.get_channel().get_transport().close()
+            conn.get_channel().get_transport().close()
+
+    def connected(self, conn=None):
+        try:
+            return self._check_conn(self._conn if conn is None else conn)
+        except Exception:
+            return False
+
+    def _worker_conn(self):
+        return self._acquire(self._pool_key(), self._connect,
+                             self._check_conn)
+
+    def _release_conn(self, conn):
+        connpool.release(self._pool_key(), conn, self._disconnect)
+
+    def is_transient(self, exc):
+        # paramiko raises IOError without errno for SFTP_FAILURE
+        # (unspecified failure on the server)
+        if isinstance(exc, SSHException) or (type(exc) is OSError and
+                                             exc.errno is None):
+            return True
+        return super().is_transient(exc)
+
+    def _reconnect(self):
+        self._disconnect(self._conn)
+        self._conn = self._acquire(self._pool_key(), self._connect,
+                                   self._check_conn)
+        self._bind()
+
+    def _stat(self, path, conn=None):
+        """Return the attributes of a file or ``None`` if there is none.
+
+        Errors are only raised if the connection was lost.
+        """
+        conn = self._conn if conn is None else conn
+        try:
+            return conn.stat(path)
+        except OSError:
+            if not self.connected(conn):
+                raise
+            return None
+
+    def _close(self):
+        connpool.release(self._pool_key(), self._conn, self._disconnect)
 
 
 class SFTPSource(_Sftp, BaseSource):
@@ -80,19 +153,38 @@ class SFTPSource(_Sftp, BaseSource):
 
     def __init__(self, job_cfg):
         super().__init__(job_cfg, job_cfg['source_host_cfg'])
+
+    def _bind(self):
+        super()._bind()
         self._listdir = self._conn.listdir
 
+    def _scandir(self, path, conn=None):
+        # one request for the directory instead of one per entry
+        conn = self._conn if conn is None else conn
+        entries = []
+        for attr in conn.listdir_attr(path):
+            name, mode = attr.filename, attr.st_mode
+            if mode is None or stat.S_ISLNK(mode):
+                # follow symbolic links
+                attr = self._stat(posixpath.join(path, name), conn)
+                mode = 0 if attr is None else attr.st_mode
+            is_dir = stat.S_ISDIR(mode)
+            entries.append((name, is_dir, not is_dir and stat.S_ISREG(mode),
+                            getattr(attr, 'st_size', None),
+                            getattr(attr, 'st_mtime', None)))
+        return entries
+
+    def _mtime(self, path, conn=None):
+        conn = self._conn if conn is None else conn
+        return conn.stat(path).st_mtime
+
     def _isdir(self, path):
-        try:
-            return stat.S_ISDIR(self._conn.stat(path).st_mode)
-        except OSError:
-            return False
+        attr = self._stat(path)
+        return attr is not None and stat.S_ISDIR(attr.st_mode)
 
     def _isfile(self, path):
-        try:
-            return stat.S_ISREG(self._conn.stat(path).st_mode)
-        except OSError:
-            return False
+        attr = self._stat(path)
+        return attr is not None and stat.S_ISREG(attr.st_mode)
 
 
 class SFTPTarget(_Sftp, BaseTarget):
@@ -106,14 +198,13 @@ class SFTPTarget(_Sftp, BaseTarget):
         super().__init__(job_cfg, job_cfg['target_host_cfg'])
         self._path_base = posixpath.basename
         self._path_dir = posixpath.dirname
+
+    def _bind(self):
+        super()._bind()
         self._rename = self._conn.rename
 
     def _path_exists(self, path):
-        try:
-            self._conn.stat(path)
-            return True
-        except OSError:
-            return False
+        return self._stat(path) is not None
 
     def _makedirs(self, path):
         p = ''
@@ -0,0 +1,155 @@
+"""Listing snapshots of sources.
+
+A snapshot stores for each directory of a source the mtime of the
+directory, a digest of the listing, the names of the subdirectories and
+the names, sizes and mtimes of the files. Files are only recorded with
+their size and mtime after they were transferred; a file whose size and
+mtime did not change since then is not transferred again.
+
+The snapshot is a gzip-compressed JSON file.
+
+.. versionadded:: 0.12.0
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+
+from .utils import replace_file
+
+_VERSION = 1
+
+_logger = logging.getLogger(__name__)
+
+
+def _digest(entries):
+    h = hashlib.blake2b(digest_size=16)
+    for name, is_dir, is_file, size, mtime in entries:
+        # the size and mtime of a directory depend on its contents
+        item = (name, True) if is_dir else (name, is_file, size, mtime)
+        h.update(repr(item).encode('utf-8', 'surrogateescape'))
+    return h.hexdigest()
+
+
+class Snapshot:
+    """Listing snapshot.
+
+    Directories are identified by their path relative to the source base
+    path (``''`` for the base path itself).
+
+    :param path: the snapshot file
+    :type path: :term:`path-like object`
+    :param str url: the source URL; a snapshot of another source is
+                    ignored
+    :param join: function for joining paths
+    """
+
+    def __init__(self, path, url, join):
+        self._file = path
+        self._url = url
+        self._join = join
+        self._old = self._load()
+        self._new = {}
+        self._pending = {}
+
+    def _load(self):
+        try:
+            with gzip.open(self._file, 'rt', encoding='utf-8') as fh:
+                data = json.load(fh)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as ex:
+            _logger.warning('Snapshot %s ignored: %s', self._file, ex)
+            return {}
+        if data.get('version') != _VERSION or data.get('url') != self._url:
+            _logger.info('Snapshot %s ignored: other source', self._file)
+            return {}
+        return data['dirs']
+
+    def entries(self, d, mtime):
+        """Return the entries of a directory if its mtime is unchanged.
+
+        The mtimes of the subdirectories are ``None``.
+
+        :param str d: the directory
+        :param float mtime: the mtime of the directory
+        :return: list of tuples (name, is_dir, is_file, size, mtime) or
+                 ``None``
+        """
+        rec = self._old.get(d)
+        if rec is None or mtime is None or rec['mtime'] != mtime:
+            return None
+        entries = [(name, True, False, None, None) for name in rec['dirs']]
+        for name, value in rec['files'].items():
+            size, mt = value or (None, None)
+            entries.append((name, False, True, size, mt))
+        return sorted(entries)
+
+    def update(self, d, mtime, entries):
+        """Record the listing of a directory.
+
+        :param str d: the directory
+        :param float mtime: the mtime of the directory
+        :param list entries: tuples (name, is_dir, is_file, size, mtime)
+        :return: the entries; files that did not change since they were
+                 transferred are marked as non-files (``is_file`` is
+                 ``False``)
+        :rtype: list
+        """
+        old = self._old.get(d)
+        digest = _digest(entries)
+        same = old is not None and old['digest'] == digest
+        old_files = old['files'] if old is not None else {}
+        files = {}
+        result = []
+        for entry in entries:
+            name, is_dir, is_file, size, mt = entry
+            if is_file:
+                prev = old_files.get(name)
+                if prev is not None and (same or prev == [size, mt]):
+                    files[name] = prev
+                    entry = (name, is_dir, False, size, mt)
+                else:
+                    files[name] = None
+                    self._pending[self._join(d, name) if d else name] = (
+                        d, name, [size, mt])
+            result.append(entry)
+        self._new[d] = {
+            'mtime': mtime,
+            'digest': digest,
+            'dirs': [e[0] for e in entries if e[1]],
+            'files': files,
+        }
+        return result
+
+    def confirm(self, path):
+        """Record a file as transferred.
+
+        :param str path: file path relative to the source base path
+        """
+        item = self._pending.pop(path, None)
+        if item is not None:
+            d, name, value = item
+            self._new[d]['files'][name] = value
+
+    def save(self):
+        """Save the snapshot.
+
+        Directories that were not listed keep their old records unless
+        they do not exist anymore.
+        """
+        dirs = dict(self._old)
+        dirs.update(self._new)
+        reachable = {}
+        stack = ['']
+        while stack:
+            d = stack.pop()
+            rec = dirs.get(d)
+            if rec is not None:
+                reachable[d] = rec
+                stack.extend(self._join(d, name) if d else name
+                             for name in rec['dirs'])
+        data = json.dumps({'version': _VERSION, 'url': self._url,
+                           'dirs': reachable}, separators=(',', ':'))
+        replace_file(self._file, gzip.compress(data.encode('utf-8')))
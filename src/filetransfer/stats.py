@@ -0,0 +1,148 @@
+"""Transfer statistics."""
+
+import time
+from datetime import timedelta
+
+
+class FileStats:
+    """Statistics of a transferred file.
+
+    All times except ``duration`` are in seconds.
+
+    .. attribute:: duration
+
+       duration of the transfer (:class:`~datetime.timedelta`)
+
+    .. attribute:: size
+
+       number of bytes
+
+    .. attribute:: open_time
+
+       time for opening the source file
+
+    .. attribute:: ttfb
+
+       time to the first byte read from the source file
+
+    .. attribute:: rename_time
+
+       time for renaming the temporary target file
+       (``0.0`` if no temporary file was used)
+    """
+
+    __slots__ = ('duration', 'size', 'open_time', 'ttfb', 'rename_time')
+
+    def __init__(self):
+        self.duration = timedelta()
+        self.size = 0
+        self.open_time = 0.0
+        self.ttfb = 0.0
+        self.rename_time = 0.0
+
+    @property
+    def bytes_per_sec(self):
+        """Return the transfer rate."""
+        secs = self.duration.total_seconds()
+        return self.size / secs if secs > 0 else 0.0
+
+    def __repr__(self):
+        return (f'FileStats(duration={self.duration!s}, size={self.size},'
+                f' open_time={self.open_time:.3f},'
+                f' ttfb={self.ttfb:.3f},'
+                f' rename_time={self.rename_time:.3f})')
+
+
+class ConnectStats:
+    """Timings of the setup of a connection.
+
+    The phases depend on the protocol:
+
+    - FTP/FTPS: ``dns``, ``connect`` (TCP and welcome message),
+      ``tls`` (FTPS only), ``login``, ``setup``
+    - SFTP: ``key`` (loading the private key), ``dns``, ``tcp``,
+      ``kex`` (SSH key exchange), ``hostkey``, ``auth``, ``channel``
+    - reused connection from the pool (daemon mode): ``reuse``
+
+    .. attribute:: endpoint
+
+       ``'source'`` or ``'target'``
+
+    .. attribute:: url
+
+       URL of the server
+
+    .. attribute:: phases
+
+       :class:`dict` phase -> time in seconds (in the order of the phases)
+
+    .. attribute:: reused
+
+       ``True`` if an idle connection from the pool was reused
+
+    .. versionadded:: 0.12.0
+    """
+
+    __slots__ = ('endpoint', 'url', 'phases', 'reused', '_t')
+
+    def __init__(self, endpoint, url):
+        self.endpoint = endpoint
+        self.url = url
+        self.phases = {}
+        self.reused = False
+        self.start()
+
+    def start(self):
+        """Start the timer for the first phase."""
+        self._t = time.perf_counter()
+
+    def mark(self, phase):
+        """End a phase and start the timer for the next one."""
+        t = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + t - self._t
+        self._t = t
+
+    @property
+    def total(self):
+        """Return the total time in seconds."""
+        return sum(self.phases.values())
+
+    def format_phases(self):
+        """Return the phases as a string like ``dns=0.001s tcp=0.010s``."""
+        return ' '.join(f'{k}={v:.3f}s' for k, v in self.phases.items())
+
+    def __repr__(self):
+        return (f'ConnectStats(endpoint={self.endpoint!r}, url={self.url!r},'
+                f' total={self.total:.3f}, reused={self.reused},'
+                f' phases={{{self.format_phases()}}})')
+
+
+class TransferStats:
+    """Statistics of a job that are not related to a single file.
+
+    The values are summed up over all attempts of a job.
+
+    .. attribute:: list_time
+
+       time in seconds for listing the source directories
+
+    .. attribute:: connect_time
+
+       time in seconds for connecting to the servers
+
+    .. attribute:: retries
+
+       number of retries of the job
+
+    .. attribute:: connects
+
+       list of :class:`ConnectStats` (one for each connection setup)
+    """
+
+    __slots__ = ('list_time', 'connect_time', 'retries', 'connects')
+
+    def __init__(self):
+        self.list_time = 0.0
+        self.connect_time = 0.0
+        self.retries = 0
+        self.connects = []
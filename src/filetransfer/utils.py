@@ -1,5 +1,11 @@
 """Utility functions."""
 
+import os
+import re
+import socket
+import tempfile
+from datetime import datetime, timedelta
+
 try:
     from importlib.resources import read_text
 except ImportError:
@@ -7,6 +13,18 @@ except ImportError:
 
 from .const import SSH_PORT
 
+_DURATION_RE = re.compile(r'\s*(\d+(?:\.\d*)?)\s*([smhd]?)\s*$', re.I)
+_DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_RETRY_MAX_INTERVAL = 60.0  # seconds
+_RETRY_BACKOFF_FACTOR = 1.0
+_RETRY_BACKOFF_BASE = 2.0
+
+_DATE_DIRECTIVE_RE = re.compile(r'%(.)')
+_DATE_PERIODS = {'Y': 'year', 'y': 'year', 'm': 'month', 'b': 'month',
+                 'B': 'month', 'd': 'day', 'j': 'day', 'H': 'hour',
+                 'M': 'minute'}
+
 
 def format_knownhost(host, port):
     """Format a hostname for a  SSH ``known_hosts`` file.
@@ -25,3 +43,124 @@ def format_knownhost(host, port):
 def read_resource(name):
     """Read a resource as text."""
     return read_text(__package__ + '.data', name)
+
+
+def parse_duration(s):
+    """Parse a duration.
+
+    A duration is a non-negative number with an optional unit:
+    ``s`` (seconds; default), ``m`` (minutes), ``h`` (hours) or ``d`` (days).
+
+    :param str s: a duration like ``90``, ``1.5m`` or ``2d``
+    :return: duration in seconds
+    :rtype: float
+    :raises ValueError: if ``s`` is not a valid duration
+    """
+    mo = _DURATION_RE.match(s)
+    if not mo:
+        raise ValueError(f'invalid duration: {s!r}')
+    return float(mo.group(1)) * _DURATION_UNITS[mo.group(2).lower()]
+
+
+def retry_delay(attempt):
+    """Return the time to wait before a retry (exponential backoff).
+
+    :param int attempt: number of the failed attempt (starting with 0)
+    :return: delay in seconds (max. 60)
+    :rtype: float
+    """
+    return min(_RETRY_MAX_INTERVAL,
+               _RETRY_BACKOFF_FACTOR * _RETRY_BACKOFF_BASE ** attempt)
+
+
+def date_path_end(path, pattern):
+    """Return the end of the period a date-named directory stands for.
+
+    The directory path is matched against as many components of the
+    pattern as it has; e.g. ``2021/05`` is matched against ``%Y/%m`` if
+    the pattern is ``%Y/%m/%d`` and stands for May 2021.
+
+    :param str path: directory path relative to the source base path
+                     (components separated by ``/``)
+    :param str pattern: a :meth:`~datetime.datetime.strptime` pattern like
+                        ``%Y/%m/%d``
+    :return: timestamp of the end of the period or ``None`` if the path
+             does not match the pattern
+    :rtype: float
+    """
+    parts = path.count('/') + 1
+    pattern_parts = pattern.split('/')
+    if parts > len(pattern_parts):
+        return None
+    pattern = '/'.join(pattern_parts[:parts])
+    directives = _DATE_DIRECTIVE_RE.findall(pattern)
+    period = _DATE_PERIODS.get(directives[-1]) if directives else None
+    if period is None:
+        return None
+    try:
+        start = datetime.strptime(path, pattern)
+    except ValueError:
+        return None
+    if period == 'year':
+        end = start.replace(year=start.year + 1)
+    elif period == 'month':
+        end = start.replace(year=start.year + start.month // 12,
+                            month=start.month % 12 + 1)
+    else:
+        end = start + timedelta(**{period + 's': 1})
+    return end.timestamp()
+
+
+def replace_file(path, data):
+    """Replace the content of a file atomically.
+
+    The parent directories are created if necessary.
+
+    :param path: the file
+    :type path: :term:`path-like object`
+    :param bytes data: the new content
+    """
+    dir_name = os.path.dirname(path)
+    os.makedirs(dir_name, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dir_name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def resolve(host, port):
+    """Resolve a host name for a TCP connection.
+
+    :return: list of address infos (see: :func:`socket.getaddrinfo`)
+    :raises OSError: if the name cannot be resolved
+    """
+    return socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+
+
+def create_connection(addrinfos, timeout=None):
+    """Connect to the first reachable address.
+
+    Like :func:`socket.create_connection` but with resolved addresses
+    (see: :func:`resolve`).
+
+    :param list addrinfos: address infos
+    :param float timeout: timeout in seconds for connecting
+    :return: connected socket
+    :rtype: socket.socket
+    :raises OSError: if no address is reachable
+    """
+    err = None
+    for family, type_, proto, _, addr in addrinfos:
+        sock = socket.socket(family, type_, proto)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(addr)
+            return sock
+        except OSError as ex:
+            err = ex
+            sock.close()
+    raise err or OSError('no address to connect to')
@@ -0,0 +1,208 @@
+"""Watching local directories with inotify (Linux only).
+
+A :class:`Watcher` reports the files in a directory that were completed,
+i.e. closed after writing or moved into the directory. New
+subdirectories are watched as soon as they are created; the files that
+were written to them before are reported, too.
+
+If events were lost (the event queue of the kernel overflowed) or the
+watched directory itself was removed, the attribute ``rescan`` is set:
+the directory must be scanned completely. A removed directory is not
+watched until :meth:`Watcher.rewatch` is called after it was created
+again.
+
+.. versionadded:: 0.12.0
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+         IN_ONLYDIR)
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+_BUF_SIZE = 64 * 1024
+
+_logger = logging.getLogger(__name__)
+
+_libc = None
+
+
+def _inotify():
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                               ctypes.c_uint32]
+            libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        except (OSError, AttributeError, TypeError):
+            raise OSError(errno.ENOSYS, 'inotify is not available') from None
+        _libc = libc
+    return _libc
+
+
+def _check(ret):
+    if ret == -1:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return ret
+
+
+class Watcher:
+    """Watch a directory for completed files.
+
+    The watcher can be used with :func:`select.select`.
+
+    :param str path: the directory
+    :param bool recursive: if ``True`` the subdirectories are watched, too
+    :raises OSError: if inotify is not available or the directory
+                     cannot be watched
+    """
+
+    def __init__(self, path, recursive=False):
+        self._libc = _inotify()
+        self._path = os.path.abspath(path)
+        self._recursive = recursive
+        self._wds = {}  # watch descriptor -> directory
+        self._fd = _check(self._libc.inotify_init1(os.O_NONBLOCK |
+                                                   os.O_CLOEXEC))
+        self.rescan = False
+        try:
+            self._add(self._path)
+        except OSError:
+            self.close()
+            raise
+
+    def fileno(self):
+        """Return the file descriptor."""
+        return self._fd
+
+    def close(self):
+        """Close the watcher."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+            self._wds.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def watching(self):
+        """``False`` if the watched directory was removed."""
+        return self._path in self._wds.values()
+
+    def rewatch(self):
+        """Watch the directory again if it was removed.
+
+        If it can be watched again, ``rescan`` is set, because files may
+        have been written to it before.
+
+        :return: ``True`` if the directory is watched
+        :rtype: bool
+        """
+        if self.watching:
+            return True
+        try:
+            self._add(self._path)
+        except OSError:
+            return False
+        self.rescan = True
+        return True
+
+    def read(self):
+        """Read the pending events.
+
+        Does not block if there are none.
+
+        :return: paths of the completed files relative to the watched
+                 directory
+        :rtype: set
+        """
+        files = set()
+        if not self.rewatch():
+            return files
+        while True:
+            try:
+                data = os.read(self._fd, _BUF_SIZE)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, pos)
+                pos += _EVENT.size
+                name = data[pos:pos + length].rstrip(b'\0')
+                pos += length
+                self._event(wd, mask, os.fsdecode(name), files)
+        start = len(self._path) + 1
+        return {p[start:] for p in files}
+
+    def _event(self, wd, mask, name, files):
+        if mask & IN_Q_OVERFLOW:
+            _logger.warning('inotify: events lost for %s', self._path)
+            self.rescan = True
+            return
+        if mask & IN_IGNORED:
+            if self._wds.pop(wd, None) == self._path:
+                self.rescan = True
+            return
+        d = self._wds.get(wd)
+        if d is None:
+            return
+        path = os.path.join(d, name)
+        if mask & IN_ISDIR:
+            if not self._recursive:
+                return
+            if mask & IN_MOVED_FROM:
+                self._remove(path)
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    self._add(path, files)
+                except OSError as ex:
+                    _logger.error('inotify: %s', ex)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            files.add(path)
+        elif mask & IN_MOVED_FROM:
+            files.discard(path)
+
+    def _add(self, path, files=None):
+        """Watch a directory (and its subdirectories if recursive).
+
+        The files in the directories are added to ``files``.
+        """
+        wd = _check(self._libc.inotify_add_watch(self._fd, os.fsencode(path),
+                                                 _MASK))
+        self._wds[wd] = path
+        if not (self._recursive or files is not None):
+            return
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if self._recursive:
+                        self._add(entry.path, files)
+                elif files is not None and entry.is_file():
+                    files.add(entry.path)
+
+    def _remove(self, path):
+        prefix = os.path.join(path, '')
+        for wd, d in list(self._wds.items()):
+            if d == path or d.startswith(prefix):
+                del self._wds[wd]
+                self._libc.inotify_rm_watch(self._fd, wd)
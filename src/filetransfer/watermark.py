@@ -0,0 +1,106 @@
+"""High-watermarks of sources.
+
+The watermark of a job is the highest mtime of the files transferred in
+the last run. Because the files are not transferred in the order of
+their mtimes, the watermark is only advanced if all files of the source
+were listed and it never passes a file that could not be transferred.
+
+The paths of the files with an mtime equal to the watermark are stored,
+too, so that a file that appears later with the same mtime (e.g. with
+the minute precision of many FTP servers) is still transferred.
+
+.. versionadded:: 0.12.0
+"""
+
+import json
+import logging
+
+from .utils import replace_file
+
+_VERSION = 1
+
+_logger = logging.getLogger(__name__)
+
+
+class Watermark:
+    """High-watermark.
+
+    :param path: the watermark file
+    :type path: :term:`path-like object`
+    :param str url: the source URL; a watermark of another source is
+                    ignored
+    """
+
+    def __init__(self, path, url):
+        self._file = path
+        self._url = url
+        self.value, self._paths = self._load()
+        self._pending = {}
+        self._done = []  # [(mtime, path), ...]
+
+    def _load(self):
+        try:
+            with open(self._file, encoding='utf-8') as fh:
+                data = json.load(fh)
+        except FileNotFoundError:
+            return None, set()
+        except (OSError, ValueError) as ex:
+            _logger.warning('Watermark %s ignored: %s', self._file, ex)
+            return None, set()
+        if data.get('version') != _VERSION or data.get('url') != self._url:
+            _logger.info('Watermark %s ignored: other source', self._file)
+            return None, set()
+        return data['mtime'], set(data.get('paths', ()))
+
+    def passed(self, path, mtime):
+        """Return ``True`` if a file was transferred in an earlier run.
+
+        That is the case if its mtime is lower than the watermark or
+        equal to it and it was transferred with this mtime.
+
+        :param str path: file path relative to the source base path
+        :param float mtime: the mtime of the file
+        :rtype: bool
+        """
+        if self.value is None:
+            return False
+        return mtime < self.value or (mtime == self.value and
+                                      path in self._paths)
+
+    def selected(self, path, mtime):
+        """Record a file that is to be transferred.
+
+        :param str path: file path relative to the source base path
+        :param float mtime: the mtime of the file
+        """
+        self._pending[path] = mtime
+
+    def transferred(self, path):
+        """Record a file as transferred.
+
+        :param str path: file path relative to the source base path
+        """
+        mtime = self._pending.pop(path, None)
+        if mtime is not None:
+            self._done.append((mtime, path))
+
+    def save(self):
+        """Save the new watermark.
+
+        It is the highest mtime of the transferred files that is lower
+        than the mtimes of all files that were not transferred.
+        """
+        limit = min(self._pending.values(), default=float('inf'))
+        value = max((mtime for mtime, _ in self._done if mtime < limit),
+                    default=None)
+        if value is None or (self.value is not None and value < self.value):
+            return
+        paths = {path for mtime, path in self._done if mtime == value}
+        if value == self.value:
+            if paths <= self._paths:
+                return
+            paths |= self._paths
+        data = json.dumps({'version': _VERSION, 'url': self._url,
+                           'mtime': value, 'paths': sorted(paths)})
+        replace_file(self._file, data.encode('utf-8'))
+        self.value, self._paths = value, paths